@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
-from tenacity import retry, stop_after_attempt, wait_exponential
 import json
+import sys
+import time
+from pathlib import Path
+
+# The LLM gateway, limiter and SQLite helpers live with the summarization app so both apps share one
+# implementation. This entry point is the one place that puts them on the path, before anything imports them.
+sys.path.append(str(Path(__file__).resolve().parent.parent / "summarization"))
+
 from vertexai.generative_models import GenerativeModel
-from concurrent.futures import ThreadPoolExecutor
 import vertexai
-import re
-from tqdm import tqdm
+from extraction import build_prompt, get_vertex_limiter
+from jobs import ExtractionJob, ExtractionStore
+from transcript import chunk_transcript, file_hash
 
 st.set_page_config(layout="wide")
 
@@ -25,126 +32,63 @@ vertexai.init(project=PROJECT_ID, location=LOCATION)
 
 model = GenerativeModel(model_name="gemini-1.5-pro-001")
 
-with open("test.txt", "r") as f:
-    content = f.read()
-
-# Assuming df is already defined as per your provided code
-# Define the regex pattern
-pattern = re.compile(r'(\w+\s\w+)\s(\d{2}:\d{2}:\d{2})\n([\s\S]+?)(?=\n\w+\s\w+\s\d{2}:\d{2}:\d{2}|$)')
-
-# Extract matches from the content
-matches = pattern.findall(content)
-
-# Create a list of dictionaries with speaker, start time, and text
-transcript_entries = [{'speaker': match[0], 'start_time': match[1], 'text': match[2].strip()} for match in matches]
-
-df = pd.DataFrame(transcript_entries)
-
-# Identify the second speaker
-second_speaker = 'Leopold Aschenbrenner'
-
-# Initialize chunks list
-chunks = []
-
-# Loop through the dataframe
-i = 0
-while i < len(df):
-    if df.loc[i, 'speaker'] == second_speaker:
-        # Capture the preceding statements by the first speaker
-        preceding_statements = []
-        j = i - 1
-        while j >= 0 and df.loc[j, 'speaker'] != second_speaker:
-            preceding_statements.insert(0, f"{df.loc[j, 'speaker']}\n{df.loc[j, 'text']}")
-            j -= 1
-        
-        # Capture the second speaker's statement
-        second_speaker_statements = []
-        while i < len(df) and df.loc[i, 'speaker'] == second_speaker:
-            second_speaker_statements.append(f"{df.loc[i, 'speaker']}\n{df.loc[i, 'text']}")
-            i += 1
-        
-        # Capture the subsequent statements by the first speaker
-        following_statements = []
-        while i < len(df) and df.loc[i, 'speaker'] != second_speaker:
-            following_statements.append(f"{df.loc[i, 'speaker']}\n{df.loc[i, 'text']}")
-            i += 1
-        
-        # Combine all statements into one chunk
-        chunk = "\n".join(preceding_statements + second_speaker_statements + following_statements)
-        chunks.append(chunk)
-    else:
-        i += 1
-
-results_df = pd.DataFrame(chunks, columns=['text'])
-
-constant_prompt = '''You will have access to an excerpt from podcast transcription where Dwarkesh Patel interviews Leopold Aschenbrenner.
-
-Your task is to extract the beliefs explicitly expressed by Leopold Aschenbrenner in the interview:
- - You should not include beliefs that are implied or inferred.
- - You should not include beliefs that are expressed by Dwarkesh Patel.
-
-The beliefs should be extracted as a list of dictionary objects, where each dictionary object has the following keys: "belief", "context", "justification", and "certainty":
- - The "belief" key should contain the belief that was expressed by Leopold Aschenbrenner.
- - The "context" key should contain the exact text where the belief was expressed. This should help illustrate the circumstances under which the belief was expressed.
- - The "justification" key should contain the key supporting evidence for the belief expressed during the interview. 
- - The "certainty" key should contain either "high", "medium", or "low" to indicate the confidence level expressed in the belief by Leopold Aschenbrenner.
-
-Please provide your response in the form of a compilable JSON object. For example:
-```json
-{
-    "beliefs": [
-        {
-            "belief": "The sky is blue.",
-            "context": "The person is talking about the color of the sky.",
-            "justification": "The sky is blue because it is the color that we see when we look up.",
-            "certainty": "high",
-        },
-        {
-            "belief": "The sun is hot.",
-            "context": "The person is talking about the temperature of the sun.",
-            "justification": "The sun is hot because it emits heat and light.",
-            "certainty": "medium"
-        }
-        ...
-    ]
-}
-```
-
-Here is the excerpt from the podcast transcription:
-<excerpt>
-'''
-
-# Define a retrying function with exponential backoff
-@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=4, max=60))
-def process_chunk(text):
-    prompt = constant_prompt.replace("<excerpt>", text)
+# The transcript and who is interviewed in it; chunks are centred on the guests' answers, and the prompt asks
+# for the guests' beliefs and not the hosts'. SPEAKERS can list every name in the transcript when some aren't
+# exactly two words.
+TRANSCRIPT_PATH = "test.txt"
+GUESTS = ["Leopold Aschenbrenner"]
+HOSTS = ["Dwarkesh Patel"]
+SPEAKERS = None
+
+@st.cache_resource
+def get_extraction_store():
+    return ExtractionStore()
+
+@st.cache_data(show_spinner=False)
+def get_chunks(path, transcript_hash, guests, speakers):
+    # transcript_hash is part of the cache key, so an edited transcript is parsed again
+    return list(chunk_transcript(path, guests, speakers))
+
+transcript_hash = file_hash(TRANSCRIPT_PATH)
+results_df = pd.DataFrame(get_chunks(TRANSCRIPT_PATH, transcript_hash, GUESTS, SPEAKERS), columns=['text'])
+
+# Every chunk's result is checkpointed as it finishes, so reruns only send chunks that never finished or failed
+job = ExtractionJob(model, results_df['text'], transcript_hash, build_prompt(GUESTS, HOSTS), store=get_extraction_store())
+pending = len(job.pending())
+if pending < len(results_df):
+    st.caption(f"Loaded {len(results_df) - pending} of {len(results_df)} chunks from earlier runs.")
+
+def render_beliefs(container, i, item):
     try:
-        response = model.generate_content(contents=prompt, generation_config={"response_mime_type": "application/json"})
-        response_json = json.loads(response.text)
-        beliefs = response_json['beliefs']
-        return json.dumps(beliefs)
+        beliefs = json.loads(item)
+        for belief in beliefs:
+            container.write(f"Chunk {i + 1}")
+            container.json(belief)
     except json.JSONDecodeError as e:
-        # Raise an exception to trigger retry
-        raise ValueError("JSON decoding error, triggering retry") from e
-    except ValueError as e:
-        # Handle specific ValueError related to blocked content
-        return f"Error: {str(e)}"
-    except Exception as e:
-        # Handle other potential errors
-        return f"Unexpected Error: {str(e)}"
-
-# Use ThreadPoolExecutor for multithreading with tqdm progress bar
-with ThreadPoolExecutor(max_workers=100) as executor:  # limiting max_workers to a reasonable number
-    extracted_beliefs = list(tqdm(executor.map(process_chunk, results_df['text']), total=len(results_df)))
+        container.write(f"Error decoding JSON for Chunk {i + 1}: {str(e)}")
+
+# One container per chunk, allocated in chunk order, so results can land in whatever order they finish
+# while the page still reads top to bottom
+progress = st.progress(0.0, text=f"Extracting beliefs from {pending} chunks...")
+chunk_containers = [st.container() for _ in range(len(results_df))]
+
+extracted_beliefs = [None] * len(results_df)
+started = time.perf_counter()
+# Stored results come back first, so everything after them was extracted in this run
+extracted = -(len(results_df) - pending)
+for i, item in job.iter_run(max_workers=100):
+    extracted_beliefs[i] = item
+    render_beliefs(chunk_containers[i], i, item)
+    extracted += 1
+    if extracted > 0:
+        limiter_stats = get_vertex_limiter().stats()
+        progress.progress(extracted / pending, text=f"Extracted {extracted} of {pending} chunks, {extracted / (time.perf_counter() - started):.2f} chunks/s with {limiter_stats['limit']} concurrent calls")
 
 # Add the extracted beliefs to the DataFrame
 results_df['extracted_beliefs'] = extracted_beliefs
 
-for i, item, in results_df['extracted_beliefs'].items():
-    try:
-        beliefs = json.loads(item)
-        for belief in beliefs:
-            st.write(f"Chunk {i + 1}")
-            st.json(belief)
-    except json.JSONDecodeError as e:
-        st.write(f"Error decoding JSON for Chunk {i + 1}: {str(e)}")
\ No newline at end of file
+if pending:
+    limiter_stats = get_vertex_limiter().stats()
+    progress.progress(1.0, text=f"Extracted {pending} chunks in {time.perf_counter() - started:.0f}s. Extraction settled at {limiter_stats['limit']} concurrent calls, with {limiter_stats['rate_limited']} rate-limited calls.")
+else:
+    progress.empty()
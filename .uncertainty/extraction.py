@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+# Shared with the summarization app, whose directory the entry point (app.py) puts on the path
+from llmgateway import get_gateway, BULK
+from concurrency import get_limiter
+from tokenbudget import count_tokens_uncached
+
+# Tokens reserved for the extracted beliefs when admitting a call
+OUTPUT_TOKENS_ESTIMATE = 2048
+# Malformed JSON is a sampling problem rather than a load problem, so it is retried straight away
+JSON_ATTEMPTS = 3
+
+# <host> and <guest> are filled in from the transcript's configuration by build_prompt
+prompt_template = '''You will have access to an excerpt from podcast transcription where <host> interviews <guest>.
+
+Your task is to extract the beliefs explicitly expressed by <guest> in the interview:
+ - You should not include beliefs that are implied or inferred.
+ - You should not include beliefs that are expressed by <host>.
+
+The beliefs should be extracted as a list of dictionary objects, where each dictionary object has the following keys: "belief", "context", "justification", and "certainty":
+ - The "belief" key should contain the belief that was expressed by <guest>.
+ - The "context" key should contain the exact text where the belief was expressed. This should help illustrate the circumstances under which the belief was expressed.
+ - The "justification" key should contain the key supporting evidence for the belief expressed during the interview. 
+ - The "certainty" key should contain either "high", "medium", or "low" to indicate the confidence level expressed in the belief by <guest>.
+
+Please provide your response in the form of a compilable JSON object. For example:
+```json
+{
+    "beliefs": [
+        {
+            "belief": "The sky is blue.",
+            "context": "The person is talking about the color of the sky.",
+            "justification": "The sky is blue because it is the color that we see when we look up.",
+            "certainty": "high",
+        },
+        {
+            "belief": "The sun is hot.",
+            "context": "The person is talking about the temperature of the sun.",
+            "justification": "The sun is hot because it emits heat and light.",
+            "certainty": "medium"
+        }
+        ...
+    ]
+}
+```
+
+Here is the excerpt from the podcast transcription:
+<excerpt>
+'''
+
+def build_prompt(guests, hosts):
+    # The prompt for one transcript: whose beliefs to extract and whose to leave out
+    return prompt_template.replace("<guest>", " and ".join(guests)).replace("<host>", " and ".join(hosts))
+
+def prompt_version(prompt):
+    # Identifies the prompt in checkpointed results, so editing it (or the speakers) invalidates them
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+def is_failure(result):
+    # process_chunk reports failures as text instead of raising
+    return result.startswith(("Error", "Unexpected Error"))
+
+def get_vertex_gateway():
+    return get_gateway(
+        "vertex",
+        requests_per_minute=int(os.getenv("GEMINI_RPM", "60")),
+        tokens_per_minute=int(os.getenv("GEMINI_TPM", "1000000")),
+    )
+
+def get_vertex_limiter():
+    # Starts small and finds the concurrency the quota sustains; the worker pool size is only its ceiling
+    return get_limiter("vertex", initial=4, max_limit=int(os.getenv("GEMINI_MAX_CONCURRENCY", "100")))
+
+def generate_beliefs(model, prompt):
+    gateway = get_vertex_gateway()
+    limiter = get_vertex_limiter()
+    estimate = count_tokens_uncached(prompt) + OUTPUT_TOKENS_ESTIMATE
+    # Quota errors shrink the limiter's concurrency, then the gateway pauses all callers and retries
+    response = gateway.call(
+        lambda: limiter.call(lambda: model.generate_content(contents=prompt, generation_config={"response_mime_type": "application/json"})),
+        estimate,
+        BULK,
+    )
+    gateway.reconcile(estimate, response.usage_metadata.total_token_count)
+    return json.loads(response.text)['beliefs']
+
+def process_chunk(model, text, prompt):
+    # model is anything with Vertex's generate_content(contents=..., generation_config=...) signature
+    prompt = prompt.replace("<excerpt>", text)
+    try:
+        for attempt in range(JSON_ATTEMPTS):
+            try:
+                return json.dumps(generate_beliefs(model, prompt))
+            except json.JSONDecodeError as e:
+                if attempt == JSON_ATTEMPTS - 1:
+                    return f"Error: JSON decoding failed after {JSON_ATTEMPTS} attempts: {str(e)}"
+    except ValueError as e:
+        # Handle specific ValueError related to blocked content
+        return f"Error: {str(e)}"
+    except Exception as e:
+        # Handle other potential errors
+        return f"Unexpected Error: {str(e)}"
+
+def iter_extract_beliefs(model, texts, prompt, max_workers=100, on_result=None):
+    # Yields (index, result) as each chunk finishes, so callers can show results long before the slowest
+    # chunk is back. Chunks not started when the caller stops iterating are cancelled. on_result(index, result)
+    # runs in the worker as soon as the chunk finishes, so chunks already in flight when the caller stops are
+    # still kept (e.g. checkpointed) rather than paid for and thrown away.
+    def run(index, text):
+        result = process_chunk(model, text, prompt)
+        if on_result is not None:
+            on_result(index, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, index, text): index for index, text in enumerate(texts)}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+def extract_beliefs(model, texts, prompt, max_workers=100):
+    # Returns one JSON string (or error message) per chunk, in chunk order
+    texts = list(texts)
+    results = [None] * len(texts)
+    for index, result in iter_extract_beliefs(model, texts, prompt, max_workers):
+        results[index] = result
+    return results
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from extraction import iter_extract_beliefs, is_failure, prompt_version
+# Shared with the summarization app, whose directory the entry point (app.py) puts on the path
+from httpcache import connect
+
+DEFAULT_STORE_PATH = os.getenv("EXTRACTION_DB", str(Path(__file__).resolve().parent / ".cache" / "extraction.sqlite"))
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ExtractionStore:
+    # One row per extracted chunk, keyed by the transcript, the chunk text and the prompt version, written as
+    # soon as the chunk finishes so an interrupted job keeps everything done before the interruption
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_STORE_PATH
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                transcript_hash TEXT NOT NULL,
+                chunk_hash TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                failed INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (transcript_hash, chunk_hash, prompt_version)
+            )"""
+        )
+        self._conn.commit()
+
+    def results(self, transcript_hash, prompt_version):
+        # {chunk_hash: (result, failed)} for every chunk of the transcript tried with this prompt
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_hash, result, failed FROM chunks WHERE transcript_hash = ? AND prompt_version = ?",
+                (transcript_hash, prompt_version),
+            ).fetchall()
+        return {chunk_hash: (result, bool(failed)) for chunk_hash, result, failed in rows}
+
+    def put(self, transcript_hash, chunk_hash, prompt_version, chunk_index, result):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+                ON CONFLICT (transcript_hash, chunk_hash, prompt_version) DO UPDATE SET
+                    chunk_index = excluded.chunk_index, result = excluded.result, failed = excluded.failed,
+                    attempts = attempts + 1, updated_at = excluded.updated_at""",
+                (transcript_hash, chunk_hash, prompt_version, chunk_index, result, int(is_failure(result)), time.time()),
+            )
+            self._conn.commit()
+
+class ExtractionJob:
+    # Belief extraction over a transcript's chunks that can be rerun or resumed: chunks with a stored result
+    # for this transcript and prompt version are skipped, and only those never tried or that failed are sent
+    def __init__(self, model, chunks, transcript_hash, prompt, store=None):
+        self.model = model
+        self.chunks = list(chunks)
+        self.chunk_hashes = [text_hash(chunk) for chunk in self.chunks]
+        self.transcript_hash = transcript_hash
+        self.prompt = prompt
+        self.store = store or ExtractionStore()
+        self.prompt_version = prompt_version(prompt)
+
+    def stored(self):
+        return self.store.results(self.transcript_hash, self.prompt_version)
+
+    def pending(self):
+        # Indices of the chunks the next run() will send to the model
+        stored = self.stored()
+        return [i for i, chunk_hash in enumerate(self.chunk_hashes) if chunk_hash not in stored or stored[chunk_hash][1]]
+
+    def iter_run(self, max_workers=100):
+        # Yields (index, result) for every chunk: stored results first, in chunk order, then the pending
+        # chunks in the order they finish. Each is checkpointed by its worker the moment it finishes, so
+        # calls still in flight when the caller stops iterating (a rerun, an exception) are kept too.
+        stored = self.stored()
+        pending = []
+        for index, chunk_hash in enumerate(self.chunk_hashes):
+            if chunk_hash in stored and not stored[chunk_hash][1]:
+                yield index, stored[chunk_hash][0]
+            else:
+                pending.append(index)
+
+        def checkpoint(position, result):
+            index = pending[position]
+            self.store.put(self.transcript_hash, self.chunk_hashes[index], self.prompt_version, index, result)
+
+        for position, result in iter_extract_beliefs(self.model, [self.chunks[i] for i in pending], self.prompt, max_workers, on_result=checkpoint):
+            yield pending[position], result
+
+    def run(self, max_workers=100):
+        # One result per chunk in chunk order, stored ones included
+        results = [None] * len(self.chunks)
+        for index, result in self.iter_run(max_workers):
+            results[index] = result
+        return results
@@ -0,0 +1,82 @@
+import hashlib
+import mmap
+import re
+
+# A turn starts with a line holding the speaker's name and the start time, e.g. "Dwarkesh Patel 00:00:00"
+HEADER_PATTERN = re.compile(r"(\w+\s\w+)\s(\d{2}:\d{2}:\d{2})")
+TIMESTAMP_PATTERN = re.compile(r"(.+?)\s(\d{2}:\d{2}:\d{2})")
+
+def file_hash(path, block_size=1 << 20):
+    # Identifies the transcript's contents for checkpointed extraction results, read a block at a time
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def iter_lines(path, use_mmap=False, encoding="utf-8"):
+    # Lines without their line endings, read one at a time; with use_mmap the file is paged in by the OS
+    # instead of copied through a read buffer
+    if not use_mmap:
+        with open(path, "r", encoding=encoding) as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for line in iter(mm.readline, b""):
+            yield line.decode(encoding).rstrip("\r\n")
+
+def parse_header(line, speakers=None):
+    # Returns (speaker, start_time) for a turn header. Without a speaker list any two-word name counts;
+    # with one, only the listed names do, so names with one or three words work and text lines ending in
+    # a timestamp aren't mistaken for headers. Surrounding whitespace is ignored, as some headers end with a space.
+    line = line.strip()
+    if speakers is None:
+        match = HEADER_PATTERN.fullmatch(line)
+    else:
+        match = TIMESTAMP_PATTERN.fullmatch(line)
+        if match is not None and match.group(1) not in speakers:
+            match = None
+    return match.groups() if match is not None else None
+
+def iter_turns(lines, speakers=None):
+    # Yields {'speaker', 'start_time', 'text'} per turn in one pass; text before the first header is dropped
+    turn = None
+    text = []
+    for line in lines:
+        header = parse_header(line, speakers)
+        if header is None:
+            if turn is not None:
+                text.append(line)
+            continue
+        if turn is not None:
+            yield {**turn, "text": "\n".join(text).strip()}
+        turn = {"speaker": header[0], "start_time": header[1]}
+        text = []
+    if turn is not None:
+        yield {**turn, "text": "\n".join(text).strip()}
+
+def format_turn(turn):
+    return f"{turn['speaker']}\n{turn['text']}"
+
+def iter_chunks(turns, guests):
+    # One chunk per run of consecutive guest turns, framed by every other speaker's turns since the previous
+    # guest run and up to the next one; the turns between two guest runs end one chunk and begin the next.
+    # Each chunk is emitted as soon as the next guest turn (or the end) shows it is complete.
+    before, guest, after = [], [], []
+    for turn in turns:
+        if turn["speaker"] in guests:
+            if guest and after:
+                yield "\n".join(before + guest + after)
+                before, guest, after = after, [], []
+            guest.append(format_turn(turn))
+        elif guest:
+            after.append(format_turn(turn))
+        else:
+            before.append(format_turn(turn))
+    if guest:
+        yield "\n".join(before + guest + after)
+
+def chunk_transcript(path, guests, speakers=None, use_mmap=False):
+    # Guest-centred chunks of a transcript file, streamed without holding the file or its turns in memory
+    return iter_chunks(iter_turns(iter_lines(path, use_mmap), set(speakers) if speakers is not None else None), set(guests))
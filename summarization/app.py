@@ -1,12 +1,18 @@
 import streamlit as st
-from openai import OpenAI
 from newsfetcher import NewsFetcher
-import json
+from pipeline import TopicPipeline, topic_seed, ARTICLE_TOKEN_BUDGET, RELEVANT_PASSAGES, SAMPLE_SIZE
+from metrics import Metrics
+from tokenbudget import fit_to_budget
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from httpcache import ArticleCache, SearchCache
+from snapshots import SnapshotStore
+from tracking import TopicTracker
+import os
 import prompts
-import datetime
 import random
-
-client = OpenAI()
+import threading
+import pandas as pd
+from itertools import islice
 
 st.set_page_config(
     page_title="Summarization with LLMs",
@@ -20,54 +26,40 @@ example_topics = [
     "Taylor Swift Relationship Status",
 ]
 
-def get_response(messages, model='gpt-4o'):
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=1,
-        response_format={ "type": "json_object" }
-    )
-    return json.loads(response.choices[0].message.content)
-
-def get_response_stream(messages, model='gpt-4o'):
-    response = ""
-    stream = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=1,
-        stream=True
-    )
-    for chunk in stream:
-        if chunk.choices[0].delta.content is not None:
-            response += chunk.choices[0].delta.content
-            yield chunk.choices[0].delta.content  # Yield the content directly for streaming
-    return response
-
-def articles_to_string(articles_df, include_id=True, include_name=True, include_date=True, include_url=True, include_text=True):
-    articles_info = []
-    for index, row in articles_df.iterrows():
-        parts = []
-        if include_id:
-            parts.append(f"**Article ID:** {index}\n\n")
-        if include_name:
-            parts.append(f"**{row['name']}**\n\n")
-        if include_date:
-            parts.append(f"**Article Date:** {str(row['datePublished'])}\n\n")
-        if include_url:
-            parts.append(f"**Article URL:** {row['url']}\n\n")
-        if include_text:
-            parts.append(f"**Article Text:** {row['text']}\n\n")
-        
-        article_string = "".join(parts)
-        articles_info.append(article_string)
-
-    return "\n\n".join(articles_info)
-
-@st.cache_data(show_spinner=False)
-def get_articles_df(ticker):
-    newsfetcher = NewsFetcher(ticker, 100)
-    newsfetcher.run()
-    return newsfetcher.articles_df
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    # Finished article frames live on disk, so memory stays flat however many topics have been looked up
+    return SnapshotStore()
+
+@st.cache_resource(show_spinner=False)
+def get_topic_tracker():
+    return TopicTracker()
+
+@st.cache_resource(show_spinner=False)
+def get_article_cache():
+    return ArticleCache()
+
+@st.cache_resource(show_spinner=False)
+def get_search_cache():
+    return SearchCache()
+
+def stream_articles(ticker, metrics=None):
+    # Yields articles with text in the seeded sample's order as they download, caching the frame once the stream
+    # is drained. Only the sample the pipeline will use is downloaded, not every search result. A snapshot is
+    # replayed in the order it was stored, so the single-article summaries get the same articles as the first run.
+    snapshot_store = get_snapshot_store()
+    snapshot = snapshot_store.get(ticker)
+    if snapshot is not None:
+        articles_df, _ = snapshot
+        yield from articles_df[articles_df['text'] != ''].to_dict('records')
+        return
+    newsfetcher = NewsFetcher(ticker, 100, article_cache=get_article_cache(), search_cache=get_search_cache(), metrics=metrics)
+    articles = []
+    for article in newsfetcher.iter_sample(SAMPLE_SIZE, seed=topic_seed(ticker)):
+        articles.append(article)
+        yield article
+    if articles:
+        snapshot_store.put(ticker, newsfetcher.collect(articles))
 
 @st.cache_data(show_spinner=False)
 def get_seed():
@@ -81,15 +73,24 @@ st.markdown("> 1. Summarization can be broadly defined as an optimization proble
 
 st.divider()
 
+use_cache = st.sidebar.toggle("Reuse cached LLM responses", value=True, help="Identical prompts within the last day replay the stored answer instead of calling the model again.")
+track_hypothesis = st.sidebar.toggle("Track this run's hypothesis", value=False, help="Replace the hypothesis tracked for this topic, which `batch.py --incremental` retests, with the one generated in this run. A topic with no tracked hypothesis starts with the first one generated.")
+
 topic = st.text_input("Enter a recent news topic or use the example:", f"{example_topics[get_seed()]}")
 if not st.button("Start"):
     st.stop()
-    
-with st.spinner(f"Fetching articles for **{topic}**..."):
-    articles_df = get_articles_df(topic)
-    articles_df = articles_df[articles_df['text'] != '']
-    articles_df = articles_df.sample(min(25, len(articles_df))).reset_index(drop=True)
-st.success(f"Fetched {len(articles_df)} articles for {topic}.")
+
+# Timings and token usage for every stage of this run, shown in the sidebar once the page has finished
+metrics = Metrics()
+
+# The first three articles to arrive go straight to the single-article summaries while the rest download
+with st.spinner(f"Fetching articles for **{topic}**..."), metrics.span("stage", "first_articles"):
+    article_stream = stream_articles(topic, metrics)
+    first_articles = pd.DataFrame(list(islice(article_stream, 3)))
+if first_articles.empty:
+    st.error(f"No articles with text were found for **{topic}**. Try another topic.")
+    st.stop()
+fetch_status = st.empty()
 
 st.divider()
 
@@ -99,35 +100,26 @@ st.subheader("Single Article Summarization")
 st.info("As a baseline, let's start with some simple examples of generic single-article summaries for the specified topic.")
 
 st.code("""
+corpus_prompt = \"\"\"\n{articles_to_string(articles_df.iloc[0:1])}\n\"\"\"
 system_prompt = \"\"\"\nYou provide clear and concise summaries of news articles. It is crucial that you escape all dollar signs with a backslash: \$.\n\"\"\"
-user_prompt = \"\"\"\n{articles_to_string(articles_df.iloc[0:1])}\n\"\"\"
+user_prompt = \"\"\"\nPlease summarize the article above.\n\"\"\"
 """)
 
 col1, col2, col3 = st.columns(3)
 
 model = "gpt-4o"
 
-with col1.expander("Single Article Summarization - Article 1", expanded=True):
-    article = articles_df.iloc[0:1]
-    st.page_link(page=article['url'].values[0], label="View Article")
-    with st.container(height=400):
-        messages = [{"role": "system", "content": f"You provide clear and concise summaries of news articles. It is crucial that you escape all dollar signs with a backslash: \$. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"}, {"role": "user", "content": articles_to_string(article)}]
-        summary_1 = st.write_stream(get_response_stream(messages, model))
-
-with col2.expander("Single Article Summarization - Article 2", expanded=True):
-    article = articles_df.iloc[1:2]
-    st.page_link(page=article['url'].values[0], label="View Article")
-    with st.container(height=400):
-        messages = [{"role": "system", "content": f"You provide clear and concise summaries of news articles. It is crucial that you escape all dollar signs with a backslash: \$. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"}, {"role": "user", "content": articles_to_string(article)}]
-        summary_2 = st.write_stream(get_response_stream(messages, model))
-
-with col3.expander("Single Article Summarization - Article 3", expanded=True):
-    article = articles_df.iloc[2:3]
-    st.page_link(page=article['url'].values[0], label="View Article")
-    with st.container(height=400):
-        messages = [{"role": "system", "content": f"You provide clear and concise summaries of news articles. It is crucial that you escape all dollar signs with a backslash: \$. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"}, {"role": "user", "content": articles_to_string(article)}]
-        summary_3 = st.write_stream(get_response_stream(messages, model))
-        
+# Every stage streams into a placeholder allocated here, in page order, so stages can run concurrently below
+summary_containers = []
+for i, col in enumerate([col1, col2, col3]):
+    # Topics with fewer than three articles only get a summary per article, as in TopicPipeline.stage_graph
+    if i >= len(first_articles):
+        col.caption("Fewer than three articles were fetched for this topic.")
+        continue
+    expander = col.expander(f"Single Article Summarization - Article {i + 1}", expanded=True)
+    expander.page_link(page=first_articles['url'].values[i], label="View Article")
+    summary_containers.append(expander.container(height=400))
+
 st.success("Great! We've established that we can generate clearer and more concise representations of the information in the articles. We can call these ***compactness-oriented summaries***, since their purpose is simply to present a distilled version of the content. This is generally what people refer to by 'summarization.'")
 
 st.warning("**However, for a variety of reasons, this isn't really more valuable than just skimming the article yourself:**  \n - Most of the value in skimming does not come from looking at one article: it comes drawing cross-article inferences.\n - We can't really be sure about what information was lost during the summarization process; when skimming, the information you focus on in each successive article will be influenced by the previous articles, allowing you to make more meaningful decisions about what to keep and discard.\n     - Since each summary is independent, there is no reason to believe the details kept during summarization would be correlated across articles.\n\n")
@@ -139,14 +131,12 @@ st.subheader("News Cycle Summarization")
 st.info("One potential solution to these problems is to include multiple articles (such as a sample from the recent news cycle) in the same prompt. This feels like it would be more useful than summarizing single articles, since we can ask the model to help draw connections between them. We'll also ask it to cite sources inline for traceability.")
 
 st.code(f"""
+corpus_prompt = \"\"\"\n{{articles_to_string(articles_df)}}\n\"\"\"
 system_prompt = \"\"\"\n{prompts.cycle_system_prompt}\n\"\"\"
-user_prompt = \"\"\"\n{{articles_to_string(articles_df)}}\n\nEnsure you reference source URLs in the summaries using inline Markdown with footnote references, such as [^1^].\n\"\"\"
+user_prompt = \"\"\"\nEnsure you reference source URLs in the summaries using inline Markdown with footnote references, such as [^1^].\n\"\"\"
 """)
 
-with st.expander("News Cycle Summarization", expanded=True):
-    with st.container(height=500):
-        messages = [{"role": "system", "content": prompts.cycle_system_prompt}, {"role": "user", "content": articles_to_string(articles_df) + f"\n\nEnsure you reference source URLs in the summaries using inline Markdown with footnote references, such as [^1^]. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"}]
-        cycle_summary_1 = st.write_stream(get_response_stream(messages, model))
+cycle_container = st.expander("News Cycle Summarization", expanded=True).container(height=500)
         
 st.success("The breadth certainly makes this more useful than a few single-article summaries!")
 
@@ -167,20 +157,8 @@ st.caption("*The prompts at this stage are multi-step and a bit longer, but stil
 
 col1, col2 = st.columns([1, 2])
 
-messages = [{"role": "system", "content": f"Topic: {topic}\n\nTodays date is {datetime.datetime.now().strftime('%Y-%m-%d')}\n\n{prompts.questioning_system_prompt}"}, {"role": "user", "content": f"Articles:\n{articles_to_string(articles_df)}\n\nPlease provide up to 6 open-ended questions that can be used to encourage critical thinking about the news cycle."}]
-
-questions = get_response(messages, model)
-            
-with col1.container(height=600):
-    for i, question in enumerate(questions['questions'], start=1):
-        with st.expander(f"Question {i}", expanded=False):
-            st.write(question)
-
-analysis_messages = [{"role": "system", "content": f"Topic: {topic}\n\nTodays date is {datetime.datetime.now().strftime('%Y-%m-%d')}\n\n{prompts.analyzing_system_prompt}"}, {"role": "user", "content": f"Articles:\n{articles_to_string(articles_df)}\n\nQuestions:\n{json.dumps(questions)}"}]
-
-
-with col2.container(height=600):
-    analysis = st.write_stream(get_response_stream(analysis_messages, model))
+questions_container = col1.container(height=600)
+analysis_container = col2.container(height=600)
     
 st.success("Compare this summary to the ones above. By incorporating the questions, we've given the task a purpose and created a more meaningful summary that is less likely to miss the information we want.")
 
@@ -196,84 +174,114 @@ st.caption("*The prompts at this stage are multi-step and a bit longer, but stil
 
 col1, col2, col3 = st.columns([1,1,2])
 
-messages = [
-    {
-        "role": "system",
-        "content": f"You provide a hypothesis and associated likelihood for news cycle analysis for the topic '{topic}'. It is crucial that you escape all dollar signs with a backslash: \$. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"
-    },
-    {
-        "role": "user",
-        "content": f"The hypothesis should be a clear, specific, and falsifiable statement that addresses a single, measurable outcome within a defined time frame. It is absolutely imperative that the hypothesis possesses a sufficient level of granularity as to be falsifiable. The likelihood should be a string representation of a either 1, 2, or 3 (where 1 indicates a probability (0%, 50%], 2:(50%, 85%] and 3:(85%:100%)) that reflects your confidence level, is supported by prior knowledge, and is testable with recent information. Namely, we will be testing via the following articles:\n{articles_to_string(articles_df, include_id=False, include_name=True, include_url=False, include_text=True)}\nPlease provide a hypothesis and an initial likelihood in the following JSON format: {{\"hypothesis\": \"Your hypothesis here.\", \"probability\": \"Likelihood level (1,2,3) here\", \"rationale\": \"Short rationale here.\"}}"
-    }
-]
-
-
-with col1.container(height=600):
-    with st.spinner("Generating hypothesis..."):
-        hypothesis = get_response(messages, model)
-    with st.expander("Hypothesis", expanded=True):
-        st.write(hypothesis['hypothesis'])
-    with st.expander("Initial Likelihood", expanded=True):
-        st.metric(label="Likelihood", value=int(hypothesis['probability']), help="1: Low likelihood (0% to 49%)\n\n2: Moderate likelihood (50% to 84%)\n\n3: High likelihood (85% to 100%)")
-    with st.expander("Rationale", expanded=True):
-        st.write(hypothesis['rationale'])      
-
-messages = [
-    {
-        "role": "system",
-        "content": f"Topic: {topic}\n\n{prompts.questioning_hypothesis_system_prompt}. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"
-    },
-    {
-        "role": "user",
-        "content": f"Articles:\n{articles_to_string(articles_df, include_id=False, include_name=True, include_url=False, include_text=True)}\n\nPlease provide up to 6 open-ended questions that can be used to test the hypothesis."
-    }
-]
-with col2.container(height=600):
-    with st.spinner("Generating questions..."):
-        questions = get_response(messages, model)
-        for i, question in enumerate(questions['questions'], start=1):
-            with st.expander(f"Question {i}", expanded=True):
-                st.write(question)
-            
-messages = [
-    {
-        "role": "system",
-        "content": f"Topic: {topic}\n\n{prompts.analyzing_questions_system_prompt}. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"
-    },
-    {
-        "role": "user",
-        "content": f"Articles:\n{articles_to_string(articles_df, include_id=False, include_name=True, include_url=False, include_text=True)}\n\nHypothesis:\n{json.dumps(hypothesis['hypothesis'])}\n\nQuestions:\n{json.dumps(questions)}"
-    }
-]
-
-with col3.container(height=600):
-    analysis = st.write_stream(get_response_stream(messages, model))
-    
-messages = [
-    {
-        "role": "system",
-        "content": f"Topic: {topic}\n\n{prompts.hypothesis_final_system_prompt}. Todays date is {datetime.datetime.now().strftime('%Y-%m-%d')}"
-    },
-    {
-        "role": "user",
-        "content": f"Articles:\n{articles_to_string(articles_df, include_id=False, include_name=True, include_url=False, include_text=True)}\n\nHypothesis:\n{json.dumps(hypothesis['hypothesis'])}\n\Likelihood\n{json.dumps(hypothesis['probability'])}\n\Analysis:\n{analysis}\nThe final probability should reflect your confidence level after considering the analysis; it should be supported by the information in the articles and the analysis. Please evaluate the hypothesis and provide a final probability and rationale in the following JSON format: {{\"likelihood\": \"Final likelihood level (1,2,3) here\", \"rationale\": \"Short rationale here.\", \"further_research\": \"Alternative sources for further research here.\"}}\n Format your response for readability, with no headers larger than H5 (#####)."
-    }
-]
-
-with st.expander("Final Analysis", expanded=True):
-    with st.spinner("Generating final analysis..."):
-        final_analysis = get_response(messages, model)
-        with st.container():
-            col1, col2, col3 = st.columns([1, 2, 2])
-            
-            col1.caption("Updated Likelihood")
-            col1.metric(label="Likelihood", value=int(final_analysis['likelihood']), delta=(int(final_analysis['likelihood']) - int(hypothesis['probability'])), help="1: Low likelihood (0% to 49%)\n\n2: Moderate likelihood (50% to 84%)\n\n3: High likelihood (85% to 100%)")
-            
-            col2.caption("Updated Rationale")
-            col2.write(final_analysis['rationale'])
-            
-            col3.caption("Areas for Further Research")
-            col3.write(final_analysis['further_research'])
+hypothesis_container = col1.container(height=600)
+hypothesis_questions_container = col2.container(height=600)
+hypothesis_analysis_container = col3.container(height=600)
+final_container = st.expander("Final Analysis", expanded=True)
+
+# Streaming stages write into the containers allocated above; JSON stages show a status until they finish
+stream_containers = {
+    **{f"summary_{i + 1}": container for i, container in enumerate(summary_containers)},
+    "cycle_summary": cycle_container,
+    "analysis": analysis_container,
+    "hypothesis_analysis": hypothesis_analysis_container,
+}
+hypothesis_status = hypothesis_container.empty()
+hypothesis_status.caption("Generating hypothesis...")
+hypothesis_questions_status = hypothesis_questions_container.empty()
+hypothesis_questions_status.caption("Generating questions...")
+final_status = final_container.empty()
+final_status.caption("Generating final analysis...")
+
+# Every article fetched this run, not just the sample, is marked as seen when the likelihood is recorded
+fetched_articles = {}
+
+def load_articles():
+    fetch_status.info(f"Fetching remaining articles for **{topic}**...")
+    fetched_articles['articles_df'] = pd.concat([first_articles, pd.DataFrame(list(article_stream))], ignore_index=True)
+    return fetched_articles['articles_df']
+
+def render(stage, stream):
+    text = stream_containers[stage].write_stream(stream)
+    if stream.finish_reason == "length":
+        stream_containers[stage].caption("This answer was cut off at the model's output limit.")
+    return text
+
+# Stage results as they finish, for displays that combine several stages
+shown_results = {}
+
+def show(stage, result):
+    shown_results[stage] = result
+    if stage == "articles_df":
+        _, trimmed = fit_to_budget(result['text'], ARTICLE_TOKEN_BUDGET)
+        if trimmed:
+            cut = sum(tokens - kept for _, tokens, kept in trimmed)
+            fetch_status.success(f"Fetched {len(result)} articles for {topic}. Trimmed the {len(trimmed)} longest by {cut:,} tokens to fit the {ARTICLE_TOKEN_BUDGET:,}-token budget per prompt.")
+        else:
+            fetch_status.success(f"Fetched {len(result)} articles for {topic}.")
+    elif stage == "questions":
+        for i, question in enumerate(result['questions'], start=1):
+            questions_container.expander(f"Question {i}", expanded=False).write(question)
+    elif stage == "hypothesis":
+        hypothesis_status.empty()
+        hypothesis_container.expander("Hypothesis", expanded=True).write(result['hypothesis'])
+        hypothesis_container.expander("Initial Likelihood", expanded=True).metric(label="Likelihood", value=int(result['probability']), help="1: Low likelihood (0% to 49%)\n\n2: Moderate likelihood (50% to 84%)\n\n3: High likelihood (85% to 100%)")
+        hypothesis_container.expander("Rationale", expanded=True).write(result['rationale'])
+    elif stage == "relevant_df":
+        hypothesis_questions_container.caption(f"Testing against up to {RELEVANT_PASSAGES} passages from {len(result)} articles most relevant to the topic and hypothesis.")
+    elif stage == "hypothesis_questions":
+        hypothesis_questions_status.empty()
+        for i, question in enumerate(result['questions'], start=1):
+            hypothesis_questions_container.expander(f"Question {i}", expanded=True).write(question)
+    elif stage == "final_analysis":
+        final_status.empty()
+        col1, col2, col3 = final_container.columns([1, 2, 2])
+
+        col1.caption("Updated Likelihood")
+        col1.metric(label="Likelihood", value=int(result['likelihood']), delta=(int(result['likelihood']) - int(shown_results['hypothesis']['probability'])), help="1: Low likelihood (0% to 49%)\n\n2: Moderate likelihood (50% to 84%)\n\n3: High likelihood (85% to 100%)")
+
+        col2.caption("Updated Rationale")
+        col2.write(result['rationale'])
+
+        col3.caption("Areas for Further Research")
+        col3.write(result['further_research'])
+
+        # Each run of the same hypothesis adds a point, so reruns days apart (or `batch.py --incremental` on a
+        # schedule) build a trend; a final analysis replayed from the response cache adds nothing new
+        llm_calls = metrics.frame("llm")
+        replayed = not llm_calls.empty and bool(llm_calls.loc[llm_calls['stage'] == "final_analysis", 'cache_hit'].any())
+        tracker = get_topic_tracker()
+        tracker.record_run(topic, fetched_articles['articles_df'], shown_results['hypothesis'], int(result['likelihood']), result['rationale'], replayed=replayed, replace_hypothesis=track_hypothesis)
+        history_df = tracker.history(topic, shown_results['hypothesis']['hypothesis'])
+        if len(history_df) > 1:
+            final_container.caption(f"Likelihood of this hypothesis over the last {len(history_df)} runs")
+            final_container.line_chart(history_df, x="run_at", y="likelihood")
+
+def show_metrics(metrics):
+    with st.sidebar.expander("Run metrics", expanded=False):
+        st.caption("Wall-clock seconds per stage, slowest first")
+        st.dataframe(metrics.latency_summary().round(3), hide_index=True)
+        prompt_cache = metrics.prompt_cache_summary()
+        st.metric("Cached input tokens", f"{prompt_cache['cached_input_tokens']:,}", help=f"{prompt_cache['cached_share']:.0%} of {prompt_cache['input_tokens']:,} input tokens were served from the provider's prompt cache.")
+        llm_calls = metrics.frame("llm")
+        if not llm_calls.empty:
+            st.caption("LLM calls")
+            st.dataframe(llm_calls[["stage", "seconds", "ttft", "tokens_per_second", "input_tokens", "cached_input_tokens", "output_tokens", "finish_reason", "retries", "cache_hit"]].round(3), hide_index=True)
+        fetches = metrics.frame("fetch")
+        if not fetches.empty:
+            st.caption("Article downloads by outcome")
+            st.dataframe(fetches.groupby("outcome")["seconds"].describe(percentiles=[0.5, 0.95])[["count", "50%", "95%", "max"]].round(3))
+        st.download_button("Download events (JSON lines)", metrics.to_jsonl(), file_name="metrics.jsonl", mime="application/x-ndjson")
+        st.download_button("Download Prometheus metrics", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+    # For scraping in production: append events to METRICS_JSONL and rewrite METRICS_PROM after every run
+    metrics.write(os.getenv("METRICS_JSONL"), os.getenv("METRICS_PROM"))
+
+pipeline = TopicPipeline(topic, model, use_cache, metrics=metrics, render=render, show=show)
+script_ctx = get_script_run_ctx()
+try:
+    pipeline.run(load_articles, first_articles, initializer=lambda: add_script_run_ctx(threading.current_thread(), script_ctx))
+finally:
+    show_metrics(metrics)
 
 st.success("Although this example is simplistic in order to be generally applicable, we've clearly demonstrated how LLMs can be used for tasks like summarization and feature extraction. Its easy to see how, with further development, this pattern could be expanded on and would scale well to evaluate large quantities of loosely structured data in a variety of domains. The real value here probably isn't in the feature extraction, but rather in the idea generation and contextualization of information.")
 
@@ -282,6 +290,7 @@ st.warning("""**There are some limitations to consider:**
 - The feature extraction example will almost never update the likelihood in a meaningful way since it uses the same data in each iteration.
     - If it does, **pay attention**, because the model likely picked up on something nuanced.
     - A more interesting approach might be to run this process two weeks apart for the same hypothesis.
+    - `python summarization/batch.py <topic> --incremental` does this on a schedule: it only fetches articles published since the topic's last run and re-tests the tracked hypothesis against them.
            
 **Some of the obvious first steps to improve this process would be to:**
 - Pre-filter articles for relevance to the specific hypothesis before forming questions so that the model isn't distracted by irrelevant information.
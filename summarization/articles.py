@@ -0,0 +1,56 @@
+import threading
+import weakref
+import pandas as pd
+from tokenbudget import fit_to_budget
+
+# Rendered fragments per live DataFrame, keyed by id() and dropped when the frame is garbage collected.
+# Frames are treated as read-only once rendered, which holds for the sampled articles the app prompts with.
+_rendered = {}
+_rendered_lock = threading.Lock()
+
+def _frame_cache(articles_df):
+    key = id(articles_df)
+    with _rendered_lock:
+        if key not in _rendered:
+            _rendered[key] = {}
+            weakref.finalize(articles_df, _rendered.pop, key, None)
+        return _rendered[key]
+
+def _fragment(articles_df, field, token_budget=None):
+    cache = _frame_cache(articles_df)
+    key = (field, token_budget if field == 'text' else None)
+    if key not in cache:
+        if field == 'id':
+            values = "**Article ID:** " + articles_df.index.map(str) + "\n\n"
+        elif field == 'name':
+            values = "**" + articles_df['name'].map(str) + "**\n\n"
+        elif field == 'date':
+            values = "**Article Date:** " + articles_df['datePublished'].map(str) + "\n\n"
+        elif field == 'url':
+            values = "**Article URL:** " + articles_df['url'].map(str) + "\n\n"
+        else:
+            texts = articles_df['text'].map(str).tolist()
+            if token_budget is not None:
+                texts, _ = fit_to_budget(texts, token_budget)
+            values = "**Article Text:** " + pd.Series(texts, index=articles_df.index, dtype=object) + "\n\n"
+        cache[key] = pd.Series(values, index=articles_df.index, dtype=object)
+    return cache[key]
+
+def articles_to_string(articles_df, include_id=True, include_name=True, include_date=True, include_url=True, include_text=True, token_budget=None):
+    # Each field is rendered once per frame with vectorized string ops, and each flag combination is
+    # assembled once, so the seven prompts built from the same sample share the work
+    cache = _frame_cache(articles_df)
+    key = ('rendered', include_id, include_name, include_date, include_url, include_text, token_budget)
+    if key not in cache:
+        fields = [
+            field for field, included in [('id', include_id), ('name', include_name), ('date', include_date), ('url', include_url), ('text', include_text)]
+            if included
+        ]
+        if articles_df.empty or not fields:
+            cache[key] = "\n\n".join([""] * len(articles_df))
+        else:
+            combined = _fragment(articles_df, fields[0], token_budget)
+            for field in fields[1:]:
+                combined = combined + _fragment(articles_df, field, token_budget)
+            cache[key] = "\n\n".join(combined.tolist())
+    return cache[key]
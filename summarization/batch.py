@@ -0,0 +1,204 @@
+"""Run the summarization pipeline for a watchlist of topics without Streamlit.
+
+Topics are searched together, the articles in each topic's sample are downloaded with every distinct
+URL fetched once and shared by all the topics that found it, and then up to --concurrency topics run
+their LLM stages at a time. Run from the repository root:
+
+    python summarization/batch.py topics.txt --output-dir results --concurrency 8
+    python summarization/batch.py "Federal Reserve Interest Rate Decision" --format jsonl
+
+Every run's likelihood is recorded per topic (see tracking.TopicTracker). With --incremental, topics
+run before only search back to their last high-water mark, download the articles not seen yet and
+re-test their tracked hypothesis against those, which is cheap enough to schedule hourly:
+
+    python summarization/batch.py topics.txt --incremental
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from newsfetcher import NewsFetcher, run_coroutine, seeded_order, SAMPLE_OVERPROVISION
+from httpcache import ArticleCache, SearchCache
+from llmgateway import BULK
+from metrics import Metrics
+from pipeline import TopicPipeline, today, topic_seed, SAMPLE_SIZE
+from tracking import TopicTracker
+
+logger = logging.getLogger(__name__)
+
+def read_topics(arguments):
+    # Each argument is either a file with one topic per line or a topic itself
+    topics = []
+    for argument in arguments:
+        if os.path.isfile(argument):
+            with open(argument, encoding="utf-8") as f:
+                topics.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+        else:
+            topics.append(argument)
+    return list(dict.fromkeys(topics))
+
+async def search_topics(topics, num_articles, search_cache, metrics, freshness=None):
+    # freshness optionally maps topics to a narrower search window than the default month
+    freshness = freshness or {}
+    fetchers = [NewsFetcher(topic, num_articles, search_cache=search_cache, metrics=metrics, freshness=freshness.get(topic, "Month")) for topic in topics]
+    results = await asyncio.gather(*(fetcher.afetch_search_results() for fetcher in fetchers), return_exceptions=True)
+    search_results = {}
+    for topic, result in zip(topics, results):
+        if isinstance(result, Exception):
+            logger.error(f"Search failed for {topic}: {result}")
+            result = pd.DataFrame()
+        search_results[topic] = result
+    return search_results
+
+def fetch_shared_articles(search_results, article_cache, metrics, max_connections, sample_size=SAMPLE_SIZE):
+    # Watchlist topics often surface the same stories; each URL is downloaded once and its text
+    # joined back onto every topic that found it. Only each topic's seeded sample is downloaded: every
+    # round takes the next candidates (over-provisioned like NewsFetcher.aiter_sample) for the topics
+    # still short of sample_size articles with text, until all are full or out of search results.
+    candidates = {
+        topic: seeded_order(articles_df, topic_seed(topic))['url'].tolist()
+        for topic, articles_df in search_results.items() if not articles_df.empty
+    }
+    taken = dict.fromkeys(candidates, 0)
+    texts = {}
+    fetcher = NewsFetcher("batch", 0, article_cache=article_cache, max_connections=max_connections, metrics=metrics)
+    while True:
+        wanted = []
+        for topic, urls in candidates.items():
+            missing = sample_size - sum(texts.get(url, '') != '' for url in urls[:taken[topic]])
+            if missing <= 0 or taken[topic] >= len(urls):
+                continue
+            next_urls = urls[taken[topic]:taken[topic] + math.ceil(missing * SAMPLE_OVERPROVISION)]
+            taken[topic] += len(next_urls)
+            wanted.extend(next_urls)
+        if not wanted:
+            break
+        # URLs another topic already downloaded count towards this one's sample without a second request
+        wanted = [url for url in dict.fromkeys(wanted) if url not in texts]
+        if wanted:
+            logger.info(f"Fetching {len(wanted)} distinct articles for {len(candidates)} topics")
+            texts.update((article['url'], article['text']) for article in fetcher.iter_articles(pd.DataFrame({'url': wanted})))
+    return texts
+
+def topic_record(topic, results):
+    hypothesis = results['hypothesis']
+    final_analysis = results['final_analysis']
+    record = {"sample_size": len(results['articles_df'])}
+    if "cycle_summary" in results:
+        # Incremental updates skip the news cycle stages and only re-test the tracked hypothesis
+        record.update({
+            "summaries": [results[name] for name in ("summary_1", "summary_2", "summary_3") if results.get(name)],
+            "cycle_summary": results['cycle_summary'],
+            "questions": json.dumps(results['questions']['questions']),
+            "analysis": results['analysis'],
+        })
+    return {
+        **record,
+        "hypothesis": hypothesis['hypothesis'],
+        "initial_likelihood": int(hypothesis['probability']),
+        "hypothesis_rationale": hypothesis['rationale'],
+        "hypothesis_questions": json.dumps(results['hypothesis_questions']['questions']),
+        "hypothesis_analysis": results['hypothesis_analysis'],
+        "final_likelihood": int(final_analysis['likelihood']),
+        "final_rationale": final_analysis['rationale'],
+        "further_research": final_analysis['further_research'],
+    }
+
+def run_topic(topic, articles_df, model, use_cache, metrics, tracker, state=None):
+    # Batch calls queue behind interactive ones in the shared LLM gateway. With a tracked state the
+    # articles are only the new ones and the stored hypothesis is updated from them.
+    pipeline = TopicPipeline(topic, model, use_cache, metrics=metrics, priority=BULK)
+    record = {"topic": topic, "run_date": today(), "mode": "update" if state else "full", "articles": int((articles_df['text'] != '').sum()) if not articles_df.empty else 0}
+    sample_df = pd.DataFrame()
+    start = time.perf_counter()
+    try:
+        if record["articles"] == 0 and state:
+            # Nothing new since the last run: the likelihood carries over without any LLM calls
+            record.update({"mode": "unchanged", "hypothesis": state['hypothesis']['hypothesis'], "final_likelihood": int(state['hypothesis']['probability'])})
+            tracker.record_run(topic, articles_df, state['hypothesis'], record['final_likelihood'])
+        elif record["articles"] == 0:
+            raise ValueError("No article text was fetched")
+        else:
+            results = pipeline.update(lambda: articles_df, state['hypothesis']) if state else pipeline.run(lambda: articles_df)
+            record.update(topic_record(topic, results))
+            sample_df = results['articles_df'].assign(topic=topic)
+            tracker.record_run(topic, articles_df, results['hypothesis'], record['final_likelihood'], record['final_rationale'])
+    except Exception as exc:
+        logger.error(f"Pipeline failed for {topic}: {exc}")
+        record["error"] = repr(exc.__cause__ or exc)
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record, sample_df
+
+def write_frame(frame, path):
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_json(path, orient="records", lines=True, force_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("topics", nargs="+", help="topics, or files with one topic per line")
+    parser.add_argument("--output-dir", default="batch_results")
+    parser.add_argument("--format", choices=["parquet", "jsonl"], default="parquet")
+    parser.add_argument("--concurrency", type=int, default=8, help="topics running their LLM stages at once")
+    parser.add_argument("--num-articles", type=int, default=100, help="search results per topic")
+    parser.add_argument("--max-connections", type=int, default=50, help="concurrent article downloads")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--no-cache", action="store_true", help="don't reuse cached LLM responses")
+    parser.add_argument("--incremental", action="store_true", help="only process articles published since each topic's last run")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    topics = read_topics(args.topics)
+    os.makedirs(args.output_dir, exist_ok=True)
+    metrics = Metrics()
+    article_cache = ArticleCache()
+    search_cache = SearchCache()
+    tracker = TopicTracker()
+    states = {topic: tracker.state(topic) for topic in topics} if args.incremental else {}
+    freshness = {topic: tracker.freshness(topic) for topic in topics} if args.incremental else None
+
+    with metrics.span("stage", "search"):
+        search_results = run_coroutine(search_topics(topics, args.num_articles, search_cache, metrics, freshness))
+    if args.incremental:
+        search_results = {topic: tracker.new_articles(topic, articles_df) for topic, articles_df in search_results.items()}
+        logger.info(f"{sum(len(articles_df) for articles_df in search_results.values())} new articles across {len(topics)} topics")
+    with metrics.span("stage", "fetch_articles"):
+        texts = fetch_shared_articles(search_results, article_cache, metrics, args.max_connections)
+
+    records, samples = [], []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = {}
+        for topic, articles_df in search_results.items():
+            if not articles_df.empty:
+                # Results outside the sample were never downloaded, so the run neither uses nor marks them as seen
+                articles_df = articles_df[articles_df['url'].isin(texts)]
+                articles_df = articles_df.assign(text=articles_df['url'].map(texts))
+            futures[executor.submit(run_topic, topic, articles_df, args.model, not args.no_cache, metrics, tracker, states.get(topic))] = topic
+        for future in as_completed(futures):
+            record, sample_df = future.result()
+            logger.info(f"Finished {record['topic']} in {record['seconds']}s" + (f" with error {record['error']}" if "error" in record else ""))
+            records.append(record)
+            samples.append(sample_df)
+
+    results_df = pd.DataFrame(records).set_index("topic").loc[topics].reset_index()
+    write_frame(results_df, os.path.join(args.output_dir, f"results.{args.format}"))
+    samples = [sample_df for sample_df in samples if not sample_df.empty]
+    if samples:
+        articles_df = pd.concat(samples, ignore_index=True)
+        # Object columns with nested values (e.g. alternate_urls, provider) are stored as JSON text
+        for column in articles_df.columns:
+            if articles_df[column].map(lambda value: isinstance(value, (list, dict))).any():
+                articles_df[column] = articles_df[column].map(lambda value: json.dumps(value) if isinstance(value, (list, dict)) else value)
+        write_frame(articles_df, os.path.join(args.output_dir, f"articles.{args.format}"))
+    metrics.write(os.path.join(args.output_dir, "metrics.jsonl"), os.path.join(args.output_dir, "metrics.prom"))
+    failed = results_df['error'].notna().sum() if 'error' in results_df else 0
+    logger.info(f"Processed {len(topics)} topics ({failed} failed) in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Micro-benchmark for article HTML extraction over the saved fixtures.
+
+Each backend is first checked against the legacy output on every fixture.
+
+Run from the repository root:
+
+    python summarization/benchmarks/bench_extract.py --copies 25
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import extractors
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def legacy_extract(html):
+    # The original two-pass pipeline: get_article_text followed by clean_text
+    soup = BeautifulSoup(html, "html.parser")
+    raw = " ".join([paragraph.get_text() for paragraph in soup.find_all("p")])
+    text = BeautifulSoup(raw, 'html.parser').get_text().strip().lower()
+    cleaned_text = '\n'.join([line for line in text.split('\n') if len(line) >= 50])
+    match = re.compile(r'(related articles.*)', re.IGNORECASE).search(cleaned_text)
+    if match:
+        cleaned_text = cleaned_text[:match.start()].strip()
+    return cleaned_text
+
+def load_corpus(copies):
+    pages = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                pages.append(f.read())
+    return pages * copies
+
+def report(label, pages, seconds):
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print(f"{label:<28} {len(pages) / seconds:>10.1f} pages/s {megabytes / seconds:>8.2f} MB/s {seconds * 1000:>9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--copies", type=int, default=25, help="times to repeat the fixture set")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Every backend must produce the legacy output on every fixture before anything is timed
+    for page in load_corpus(1):
+        expected = legacy_extract(page)
+        for backend in extractors.available_backends():
+            if extractors.extract_article(page, backend) != expected:
+                sys.exit(f"{backend} output differs from the legacy pipeline")
+
+    pages = load_corpus(args.copies)
+    print(f"{len(pages)} pages, {sum(len(page) for page in pages) / 1e6:.1f} MB\n")
+
+    start = time.perf_counter()
+    for page in pages:
+        legacy_extract(page)
+    report("legacy (2x html.parser)", pages, time.perf_counter() - start)
+
+    for backend in extractors.available_backends():
+        start = time.perf_counter()
+        for page in pages:
+            extractors.extract_article(page, backend)
+        report(backend, pages, time.perf_counter() - start)
+
+    backend = extractors.default_backend()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        # Warm the workers so start-up isn't counted
+        list(pool.map(extractors.extract_article, pages[:args.workers], [backend] * args.workers))
+        start = time.perf_counter()
+        list(pool.map(extractors.extract_article, pages, [backend] * len(pages), chunksize=4))
+        report(f"{backend} x{args.workers} processes", pages, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
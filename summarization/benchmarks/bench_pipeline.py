@@ -0,0 +1,177 @@
+"""End-to-end benchmark of the news pipeline and belief extraction against local mock servers.
+
+No network access is needed: search, publisher pages and the chat model are all served by
+mockservers.MockServers. Run from the repository root:
+
+    python summarization/benchmarks/bench_pipeline.py --scales 25,100,300
+    python summarization/benchmarks/bench_pipeline.py --output bench.json
+    python summarization/benchmarks/bench_pipeline.py --compare bench.json --tolerance 0.25
+
+With --compare the exit status is 1 when any p95 latency or throughput is worse than the
+baseline by more than the tolerance, so the script can gate a CI job.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(BENCHMARKS_DIR)), ".uncertainty"))
+
+# Configured before the pipeline modules are imported: clients, caches and gateways read these on first use
+os.environ.setdefault("NEWS_CACHE_DIR", tempfile.mkdtemp(prefix="bench-cache-"))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+for name, value in [("OPENAI_RPM", "100000"), ("OPENAI_TPM", "1000000000"), ("GEMINI_RPM", "100000"), ("GEMINI_TPM", "1000000000")]:
+    os.environ.setdefault(name, value)
+
+import logging
+# The mock publishers fail some requests on purpose; their error logs would drown the report
+logging.disable(logging.ERROR)
+
+from mockservers import MockServers, ChatCompletionsModel
+
+def run_pipeline(servers, scale, metrics):
+    from newsfetcher import NewsFetcher
+    from pipeline import TopicPipeline
+
+    topic = "Benchmark Topic"
+    # Every mock publisher shares one host, so the per-host limit is lifted to the global one
+    fetcher = NewsFetcher(topic, scale, subscription_key="benchmark", max_connections_per_host=50, metrics=metrics)
+    fetcher.search_url = servers.search_url
+    with metrics.span("stage", "fetch_articles"):
+        fetcher.run()
+    with metrics.span("stage", "llm_stages"):
+        TopicPipeline(topic, use_cache=False, metrics=metrics).run(lambda: fetcher.articles_df)
+    return int((fetcher.articles_df['text'] != '').sum())
+
+def synthetic_chunks(servers, count):
+    rng = random.Random(count)
+    return [
+        "\n".join(
+            f"{speaker}\n" + " ".join(rng.choice(servers.vocabulary) for _ in range(rng.randint(60, 160)))
+            for speaker in ["Dwarkesh Patel", "Leopold Aschenbrenner", "Dwarkesh Patel"]
+        )
+        for _ in range(count)
+    ]
+
+def run_extraction(servers, scale, metrics):
+    from extraction import build_prompt, extract_beliefs, get_vertex_limiter, is_failure
+
+    model = ChatCompletionsModel(servers.openai_base_url)
+    generate_content = model.generate_content
+
+    def timed_generate_content(*args, **kwargs):
+        with metrics.span("llm", "extraction"):
+            return generate_content(*args, **kwargs)
+
+    model.generate_content = timed_generate_content
+    with metrics.span("stage", "extract_beliefs"):
+        results = extract_beliefs(model, synthetic_chunks(servers, scale), build_prompt(["Leopold Aschenbrenner"], ["Dwarkesh Patel"]))
+    stats = get_vertex_limiter().stats()
+    print(f"extraction @ {scale}: concurrency limit {stats['limit']}, {stats['rate_limited']} rate-limited calls so far")
+    return sum(not is_failure(result) for result in results)
+
+def summarize(scale, metrics, items):
+    # One row per (kind, stage) of interest. Phase throughput is articles, LLM calls or chunks per second;
+    # the TTFT row reports the median streamed tokens per second instead.
+    rows = []
+    latency = metrics.latency_summary().set_index(["kind", "stage"])
+    events = metrics.frame()
+    stage_calls = int(((events["kind"] == "llm") & (events["stage"] != "extraction")).sum())
+    for (kind, stage), label, count in [
+        (("fetch", "fetch"), "article fetch", items.get("articles")),
+        (("parse", "parse"), "article parse", None),
+        (("stage", "fetch_articles"), "fetch phase", items.get("articles")),
+        (("stage", "llm_stages"), "llm stages", stage_calls),
+        (("stage", "extract_beliefs"), "extraction phase", items.get("chunks")),
+        (("llm", "extraction"), "extraction call", None),
+    ]:
+        if (kind, stage) not in latency.index:
+            continue
+        row = latency.loc[(kind, stage)]
+        rows.append({
+            "scale": scale,
+            "phase": label,
+            "count": int(row["count"]),
+            "p50": float(row["p50"]),
+            "p95": float(row["p95"]),
+            "throughput": (count or int(row["count"])) / float(row["total"]) if kind == "stage" else None,
+        })
+    llm_calls = events[events["kind"] == "llm"].dropna(subset=["ttft"]) if "ttft" in events else events.iloc[0:0]
+    if not llm_calls.empty:
+        rows.append({
+            "scale": scale,
+            "phase": "llm ttft",
+            "count": len(llm_calls),
+            "p50": float(llm_calls["ttft"].median()),
+            "p95": float(llm_calls["ttft"].quantile(0.95)),
+            "throughput": float(llm_calls["tokens_per_second"].median()),
+        })
+    return rows
+
+def print_rows(rows):
+    print(f"{'scale':>6} {'phase':<18} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'throughput':>12}")
+    for row in rows:
+        throughput = f"{row['throughput']:>10.1f}/s" if row["throughput"] is not None else f"{'':>12}"
+        print(f"{row['scale']:>6} {row['phase']:<18} {row['count']:>6} {row['p50'] * 1000:>9.1f} {row['p95'] * 1000:>9.1f} {throughput}")
+
+def compare(rows, baseline_rows, tolerance):
+    baseline = {(row["scale"], row["phase"]): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        before = baseline.get((row["scale"], row["phase"]))
+        if before is None:
+            continue
+        if row["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{row['phase']} @ {row['scale']}: p95 {before['p95'] * 1000:.1f} -> {row['p95'] * 1000:.1f} ms")
+        if row["throughput"] is not None and before["throughput"] and row["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{row['phase']} @ {row['scale']}: throughput {before['throughput']:.1f} -> {row['throughput']:.1f}/s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="25,100,300", help="comma-separated article and chunk counts")
+    parser.add_argument("--article-latency", type=float, nargs=2, default=(0.02, 0.2), metavar=("MIN", "MAX"))
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before the mock model's first token")
+    parser.add_argument("--tokens-per-second", type=int, default=400)
+    parser.add_argument("--chat-capacity", type=int, help="concurrent chat requests the mock model serves before answering 429")
+    parser.add_argument("--skip-extraction", action="store_true")
+    parser.add_argument("--output", help="write the result rows to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    from metrics import Metrics
+    from newsfetcher import get_parse_pool
+    import extractors
+
+    # Start the parse workers up front so process spawn time isn't billed to the first scale
+    list(get_parse_pool().map(extractors.extract_article, ["<p></p>"] * (os.cpu_count() or 1)))
+
+    rows = []
+    with MockServers(article_latency=args.article_latency, failure_rate=args.failure_rate, ttft=args.ttft, tokens_per_second=args.tokens_per_second, chat_capacity=args.chat_capacity) as servers:
+        os.environ["OPENAI_BASE_URL"] = servers.openai_base_url
+        for scale in [int(scale) for scale in args.scales.split(",")]:
+            metrics = Metrics()
+            items = {"articles": run_pipeline(servers, scale, metrics)}
+            if not args.skip_extraction:
+                items["chunks"] = run_extraction(servers, scale, metrics)
+            rows.extend(summarize(scale, metrics, items))
+    print_rows(rows)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(rows, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark of the .uncertainty transcript parser and chunker on a synthetic multi-hour interview.
+
+The streaming parser (transcript.chunk_transcript, read line by line and memory-mapped) is timed
+against the original whole-file regex and DataFrame loop, and both must produce the same chunks,
+on the synthetic transcript and on the real one in .uncertainty/archive/extraction/test.txt.
+Run from the repository root:
+
+    python summarization/benchmarks/bench_transcript.py --hours 10
+    python summarization/benchmarks/bench_transcript.py --hours 10 --episodes 20
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+UNCERTAINTY_DIR = os.path.join(os.path.dirname(os.path.dirname(BENCHMARKS_DIR)), ".uncertainty")
+sys.path.insert(0, UNCERTAINTY_DIR)
+
+import pandas as pd
+from transcript import chunk_transcript
+
+HOST = "Dwarkesh Patel"
+GUEST = "Leopold Aschenbrenner"
+# A real episode, with the irregularities a synthetic one lacks
+REAL_TRANSCRIPT = os.path.join(UNCERTAINTY_DIR, "archive", "extraction", "test.txt")
+# Conversational speech runs at about 150 words a minute
+WORDS_PER_SECOND = 2.5
+
+def write_transcript(path, hours, episodes, seed=0):
+    # Alternating host and guest turns with the odd follow-up by the same speaker and multi-paragraph answers
+    rng = random.Random(seed)
+    words = "the of and to a in that is it we you this for on be are with as I have not but they at think".split()
+    turns = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(episodes):
+            elapsed = 0
+            speaker = HOST
+            while elapsed < hours * 3600:
+                seconds = rng.randint(5, 40) if speaker == HOST else rng.randint(20, 180)
+                paragraphs = [" ".join(rng.choices(words, k=max(1, int(seconds * WORDS_PER_SECOND) // 2))) for _ in range(rng.randint(1, 2))]
+                f.write(f"{speaker} {elapsed // 3600:02d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d}\n" + "\n\n".join(paragraphs) + "\n\n")
+                elapsed += seconds
+                turns += 1
+                if rng.random() > 0.15:
+                    speaker = GUEST if speaker == HOST else HOST
+    return turns
+
+def legacy_chunks(path, second_speaker):
+    # The original implementation from .uncertainty/app.py, kept as the reference. Its regex skipped headers
+    # with trailing whitespace, dropping that turn, so those headers are trimmed first: the reference then
+    # gives the intended chunks, and the streaming parser is checked against them.
+    with open(path, "r") as f:
+        content = re.sub(r'(?m)^(\w+\s\w+\s\d{2}:\d{2}:\d{2})[ \t]+$', r'\1', f.read())
+    pattern = re.compile(r'(\w+\s\w+)\s(\d{2}:\d{2}:\d{2})\n([\s\S]+?)(?=\n\w+\s\w+\s\d{2}:\d{2}:\d{2}|$)')
+    matches = pattern.findall(content)
+    df = pd.DataFrame([{'speaker': match[0], 'start_time': match[1], 'text': match[2].strip()} for match in matches])
+    chunks = []
+    i = 0
+    while i < len(df):
+        if df.loc[i, 'speaker'] == second_speaker:
+            preceding_statements = []
+            j = i - 1
+            while j >= 0 and df.loc[j, 'speaker'] != second_speaker:
+                preceding_statements.insert(0, f"{df.loc[j, 'speaker']}\n{df.loc[j, 'text']}")
+                j -= 1
+            second_speaker_statements = []
+            while i < len(df) and df.loc[i, 'speaker'] == second_speaker:
+                second_speaker_statements.append(f"{df.loc[i, 'speaker']}\n{df.loc[i, 'text']}")
+                i += 1
+            following_statements = []
+            while i < len(df) and df.loc[i, 'speaker'] != second_speaker:
+                following_statements.append(f"{df.loc[i, 'speaker']}\n{df.loc[i, 'text']}")
+                i += 1
+            chunks.append("\n".join(preceding_statements + second_speaker_statements + following_statements))
+        else:
+            i += 1
+    return chunks
+
+def measure(label, run, skip_memory=False):
+    # Wall-clock time without tracing, then peak Python allocations in a second traced run
+    start = time.perf_counter()
+    chunks = run()
+    seconds = time.perf_counter() - start
+    peak = None
+    if not skip_memory:
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"parser": label, "seconds": seconds, "peak_mb": peak / 2 ** 20 if peak is not None else None, "chunks": chunks}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=10, help="length of each synthetic episode")
+    parser.add_argument("--episodes", type=int, default=1, help="episodes concatenated into one file")
+    parser.add_argument("--skip-legacy", action="store_true", help="only run the streaming parser, e.g. for very large files")
+    args = parser.parse_args()
+
+    if not args.skip_legacy and os.path.exists(REAL_TRANSCRIPT):
+        if legacy_chunks(REAL_TRANSCRIPT, GUEST) != list(chunk_transcript(REAL_TRANSCRIPT, [GUEST])):
+            sys.exit(f"Streaming chunks differ from the legacy implementation on {REAL_TRANSCRIPT}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "transcript.txt")
+        turns = write_transcript(path, args.hours, args.episodes)
+        print(f"{turns:,} turns, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+        # Chunks are consumed one at a time, as the extraction step would, rather than collected
+        rows = [
+            measure("streaming", lambda: sum(1 for _ in chunk_transcript(path, [GUEST]))),
+            measure("streaming mmap", lambda: sum(1 for _ in chunk_transcript(path, [GUEST], use_mmap=True))),
+        ]
+        if not args.skip_legacy:
+            legacy = measure("legacy", lambda: legacy_chunks(path, GUEST))
+            if legacy["chunks"] != list(chunk_transcript(path, [GUEST])):
+                sys.exit("Streaming chunks differ from the legacy implementation")
+            legacy["chunks"] = len(legacy["chunks"])
+            rows.append(legacy)
+
+    print(f"{'parser':<16} {'chunks':>7} {'seconds':>9} {'peak MB':>9}")
+    for row in rows:
+        peak = f"{row['peak_mb']:>9.1f}" if row["peak_mb"] is not None else f"{'':>9}"
+        print(f"{row['parser']:<16} {row['chunks']:>7} {row['seconds']:>9.3f} {peak}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Local stand-ins for the news search API, publisher sites and an OpenAI-compatible chat endpoint.
+
+Everything is served by one aiohttp app on 127.0.0.1 from a background thread:
+
+    /v7.0/news/search       Bing News-shaped search results pointing at /articles/<n>
+    /articles/<n>           synthetic article HTML with configurable latency and failure rate
+    /v1/chat/completions    chat completions, streamed as server-sent events at a configurable token rate
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from aiohttp import web
+import requests
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# One JSON object with the keys every JSON-mode prompt in both apps reads
+CANNED_JSON = {
+    "questions": [f"What does the coverage suggest about development {i}?" for i in range(1, 7)],
+    "hypothesis": "The announced deal will close before the end of the quarter.",
+    "probability": "2",
+    "likelihood": "2",
+    "rationale": "Several outlets report that regulators have signalled approval.",
+    "further_research": "Regulatory filings and the companies' investor relations pages.",
+    "beliefs": [
+        {"belief": "Compute will keep scaling.", "context": "Discussing training runs.", "justification": "Investment trends.", "certainty": "high"},
+    ],
+}
+
+def fixture_vocabulary():
+    # English-looking filler for synthetic articles, taken from the saved publisher pages
+    import extractors
+    words = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                words.extend(extractors.extract_article(f.read(), "html.parser").split())
+    return sorted(set(words))
+
+def approx_tokens(text):
+    return max(1, len(text) // 4)
+
+class MockServers:
+    # Use as a context manager; base_url, search_url and openai_base_url are set once it has started.
+    # Every n-th article (syndication_every) reprints the story before it, so near-duplicate collapsing has work to do.
+    # With chat_capacity set, chat requests beyond that many in flight get a 429 like an exhausted quota would.
+    def __init__(self, article_latency=(0.02, 0.2), failure_rate=0.05, paragraphs=(8, 30), syndication_every=10,
+                 ttft=0.3, tokens_per_second=400, completion_tokens=200, seed=0, chat_capacity=None):
+        self.article_latency = article_latency
+        self.failure_rate = failure_rate
+        self.paragraphs = paragraphs
+        self.syndication_every = syndication_every
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.seed = seed
+        self.chat_capacity = chat_capacity
+        self.vocabulary = fixture_vocabulary()
+        self.requests = {"search": 0, "article": 0, "chat": 0, "rate_limited": 0}
+        self._chats_in_flight = 0
+        self._started = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._run())
+
+    async def _run(self):
+        self._stop = asyncio.Event()
+        app = web.Application()
+        app.router.add_get("/v7.0/news/search", self.search)
+        app.router.add_get("/articles/{number}", self.article)
+        app.router.add_post("/v1/chat/completions", self.chat)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.search_url = f"{self.base_url}/v7.0/news/search"
+        self.openai_base_url = f"{self.base_url}/v1"
+        self._started.set()
+        await self._stop.wait()
+        await runner.cleanup()
+
+    def _random(self, number):
+        return random.Random(self.seed * 1_000_003 + number)
+
+    async def search(self, request):
+        self.requests["search"] += 1
+        count = int(request.query.get("count", 10))
+        offset = int(request.query.get("offset", 0))
+        query = request.query.get("q", "")
+        # The result set is finite (1,000 stories) so paging past the end returns a short page
+        numbers = range(offset, min(offset + count, 1000))
+        value = [
+            {
+                "name": f"{query}: story {number}",
+                "url": f"{self.base_url}/articles/{number}",
+                "description": f"Coverage of {query}, story {number}.",
+                "datePublished": f"2024-06-{number % 28 + 1:02d}T12:00:00.0000000Z",
+                "provider": [{"name": f"Publisher {number % 37}"}],
+            }
+            for number in numbers
+        ]
+        return web.json_response({"_type": "News", "value": value})
+
+    def article_html(self, number):
+        story = number - 1 if self.syndication_every and number % self.syndication_every == 1 and number > 0 else number
+        rng = self._random(story)
+        paragraphs = [
+            " ".join(rng.choice(self.vocabulary) for _ in range(rng.randint(40, 90))).capitalize() + "."
+            for _ in range(rng.randint(*self.paragraphs))
+        ]
+        body = "".join(f"<p>{paragraph}</p>\n" for paragraph in paragraphs)
+        return (
+            f"<html><head><meta charset='utf-8'><title>Story {story}</title></head><body>"
+            f"<nav><ul><li>Home</li><li>Markets</li></ul></nav><div class='ad'>Advertisement</div>"
+            f"<article><h1>Story {story}</h1>{body}</article>"
+            f"<aside><p>Related articles: more coverage you may like.</p></aside></body></html>"
+        )
+
+    async def article(self, request):
+        self.requests["article"] += 1
+        number = int(request.match_info["number"])
+        rng = self._random(number)
+        await asyncio.sleep(rng.uniform(*self.article_latency))
+        if rng.random() < self.failure_rate:
+            return web.Response(status=503, text="Service Unavailable")
+        return web.Response(text=self.article_html(number), content_type="text/html", charset="utf-8")
+
+    def completion_text(self, json_mode):
+        if json_mode:
+            return json.dumps(CANNED_JSON)
+        rng = self._random(self.requests["chat"])
+        return " ".join(rng.choice(self.vocabulary) for _ in range(self.completion_tokens))
+
+    async def chat(self, request):
+        if self.chat_capacity is not None and self._chats_in_flight >= self.chat_capacity:
+            self.requests["rate_limited"] += 1
+            error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            return web.json_response(error, status=429, headers={"retry-after-ms": "250"})
+        self._chats_in_flight += 1
+        try:
+            return await self._chat(request)
+        finally:
+            self._chats_in_flight -= 1
+
+    async def _chat(self, request):
+        self.requests["chat"] += 1
+        payload = await request.json()
+        prompt_tokens = sum(approx_tokens(message["content"]) for message in payload["messages"])
+        json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+        text = self.completion_text(json_mode)
+        # JSON answers are sent whole; plain text is streamed a word at a time, roughly one token each
+        pieces = [text] if json_mode else [word + " " for word in text.split(" ")]
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(pieces) if not json_mode else approx_tokens(text),
+            "total_tokens": prompt_tokens + (len(pieces) if not json_mode else approx_tokens(text)),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        base = {"id": f"chatcmpl-{self.requests['chat']}", "created": int(time.time()), "model": payload["model"]}
+        await asyncio.sleep(self.ttft)
+        if not payload.get("stream"):
+            await asyncio.sleep(usage["completion_tokens"] / self.tokens_per_second)
+            return web.json_response({
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        # Sleeping per batch of tokens keeps the event loop's timer overhead out of the measured token rate
+        batch = max(1, self.tokens_per_second // 50)
+        for start in range(0, len(pieces), batch):
+            for piece in pieces[start:start + batch]:
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(batch / self.tokens_per_second)
+        final = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        await response.write(f"data: {json.dumps(final)}\n\n".encode())
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            await response.write(f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+class ChatCompletionsModel:
+    # Presents the mock chat endpoint through Vertex's GenerativeModel.generate_content interface, so the
+    # .uncertainty extraction loop can run against it unchanged
+    def __init__(self, openai_base_url, model="gemini-1.5-pro-001"):
+        self.url = f"{openai_base_url}/chat/completions"
+        self.model = model
+        self.session = requests.Session()
+        # Extraction runs up to 100 threads; keep a connection per thread instead of reconnecting
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=128)
+        self.session.mount("http://", adapter)
+
+    def generate_content(self, contents, generation_config=None):
+        json_mode = (generation_config or {}).get("response_mime_type") == "application/json"
+        payload = {"model": self.model, "messages": [{"role": "user", "content": contents}]}
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        response = self.session.post(self.url, json=payload)
+        response.raise_for_status()
+        body = response.json()
+        return SimpleNamespace(
+            text=body["choices"][0]["message"]["content"],
+            usage_metadata=SimpleNamespace(total_token_count=body["usage"]["total_tokens"]),
+        )
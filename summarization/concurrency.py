@@ -0,0 +1,91 @@
+import collections
+import logging
+import threading
+import time
+from llmgateway import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveLimiter:
+    # AIMD limit on concurrent calls. Each successful call whose latency stays within latency_tolerance of
+    # the fastest recent call adds 1/limit (about one more slot per round trip); a slow one holds the limit,
+    # and a rate-limit error multiplies it by backoff. Calls that started before the last cut don't cut it
+    # again, so a burst of 429s from one round only halves the limit once.
+    def __init__(self, initial=4, min_limit=1, max_limit=100, backoff=0.5, latency_tolerance=2.0, window=60.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.window = window
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.baseline = None
+        self._last_decrease = 0.0
+        self._created = time.monotonic()
+        self._completed = collections.deque()
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started, latency=None, rate_limited=False):
+        now = time.monotonic()
+        with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.rate_limited += 1
+                if started >= self._last_decrease:
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+                    logger.info(f"Rate limited, concurrency limit cut to {int(self.limit)}")
+            elif latency is not None:
+                self._completed.append(now)
+                # The baseline drifts up slowly so one unusually fast call doesn't stop growth for good
+                self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.01)
+                if latency <= self.baseline * self.latency_tolerance:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def call(self, fn):
+        # Runs fn in a slot; errors are re-raised after a rate-limit error has shrunk the limit
+        started = self.acquire()
+        latency = None
+        rate_limited = False
+        try:
+            result = fn()
+            latency = time.monotonic() - started
+            return result
+        except Exception as error:
+            rate_limited = is_rate_limit_error(error)
+            raise
+        finally:
+            # Interrupted calls give their slot back too, they just don't count as successes
+            self.release(started, latency, rate_limited)
+
+    def throughput(self):
+        # Successful calls per second over the last window (or since the limiter was created, if sooner)
+        with self._condition:
+            now = time.monotonic()
+            while self._completed and self._completed[0] < now - self.window:
+                self._completed.popleft()
+            return len(self._completed) / max(min(self.window, now - self._created), 1e-9)
+
+    def stats(self):
+        throughput = self.throughput()
+        with self._condition:
+            return {"limit": int(self.limit), "in_flight": self.in_flight, "throughput": throughput, "rate_limited": self.rate_limited}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name, **kwargs):
+    # One limiter per provider, shared by every caller in the process
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(**kwargs)
+        return _limiters[name]
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SIMILARITY_THRESHOLD = 0.7
+
+_rng = np.random.default_rng(20240601)
+# Multiply-shift hash family over 64-bit shingle hashes; odd multipliers keep each one a bijection
+_MULTIPLIERS = _rng.integers(1, 2**63, NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_OFFSETS = _rng.integers(0, 2**63, NUM_PERMUTATIONS, dtype=np.uint64)
+_SHINGLE_WEIGHTS = _rng.integers(1, 2**63, SHINGLE_SIZE, dtype=np.uint64) | np.uint64(1)
+
+def minhash_signatures(texts):
+    # Words from every document are hashed in one vectorized pass, then each document's
+    # word-hash window is folded into shingle hashes and min-hashed with numpy
+    tokenized = [text.lower().split() for text in texts]
+    lengths = np.array([len(words) for words in tokenized])
+    word_hashes = pd.util.hash_array(np.array([word for words in tokenized for word in words], dtype=object))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for i in range(len(texts)):
+            words = word_hashes[offsets[i]:offsets[i + 1]]
+            if len(words) == 0:
+                continue
+            window = min(SHINGLE_SIZE, len(words))
+            shingles = np.zeros(len(words) - window + 1, dtype=np.uint64)
+            for j in range(window):
+                shingles += words[j:len(words) - window + 1 + j] * _SHINGLE_WEIGHTS[j]
+            signatures[i] = (np.outer(_MULTIPLIERS, shingles) + _OFFSETS[:, None]).min(axis=1)
+    return signatures
+
+def near_duplicate_groups(texts, threshold=SIMILARITY_THRESHOLD):
+    # Returns a group label per text; texts whose estimated Jaccard similarity passes the threshold share a label.
+    # Candidate pairs come from LSH banding, so only documents colliding in some band are compared.
+    texts = list(texts)
+    parents = list(range(len(texts)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    candidates = [i for i, text in enumerate(texts) if text.strip()]
+    signatures = minhash_signatures([texts[i] for i in candidates])
+    rows_per_band = NUM_PERMUTATIONS // BANDS
+    for band in range(BANDS):
+        buckets = {}
+        band_signatures = np.ascontiguousarray(signatures[:, band * rows_per_band:(band + 1) * rows_per_band])
+        for position, key in enumerate(band_signatures.view(f"V{band_signatures.shape[1] * 8}").ravel()):
+            buckets.setdefault(key.tobytes(), []).append(position)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if find(candidates[first]) != find(candidates[other]) and np.mean(signatures[first] == signatures[other]) >= threshold:
+                    parents[find(candidates[other])] = find(candidates[first])
+    return [find(i) for i in range(len(texts))]
+
+def collapse_near_duplicates(articles_df, threshold=SIMILARITY_THRESHOLD):
+    # Keeps the longest copy of each syndicated story and records the other copies' URLs in 'alternate_urls'.
+    # Frames that were collapsed before (e.g. snapshots) keep the alternates they already had.
+    if articles_df.empty:
+        return articles_df
+    articles_df = articles_df.copy()
+    texts = articles_df['text'].fillna("").astype(str)
+    articles_df['_group'] = near_duplicate_groups(texts, threshold)
+    articles_df['_length'] = texts.str.len()
+    ordered = articles_df.sort_values('_length', ascending=False, kind='stable')
+    previous = ordered['alternate_urls'] if 'alternate_urls' in ordered else [None] * len(ordered)
+    alternate_urls = {}
+    for group, url, alternates in zip(ordered['_group'], ordered['url'], previous):
+        # The first (longest) copy of each group is its representative, every later one an alternate
+        if group in alternate_urls:
+            alternate_urls[group].append(url)
+        else:
+            alternate_urls[group] = []
+        if isinstance(alternates, (list, tuple, np.ndarray)):
+            alternate_urls[group].extend(alternates)
+    alternate_urls = pd.Series({group: list(dict.fromkeys(urls)) for group, urls in alternate_urls.items()}, dtype=object)
+    representatives = ordered.drop_duplicates('_group').sort_index()
+    representatives['alternate_urls'] = representatives['_group'].map(alternate_urls)
+    return representatives.drop(columns=['_group', '_length']).reset_index(drop=True)
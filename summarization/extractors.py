@@ -0,0 +1,91 @@
+import re
+import codecs
+import logging
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+MIN_LINE_LENGTH = 50
+RELATED_PATTERN = re.compile(r'related articles', re.IGNORECASE)
+META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+XML_DECLARATION_PATTERN = re.compile(r'^\s*<\?xml[^>]*\?>')
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+def is_html(content_type):
+    # A missing Content-Type is given the benefit of the doubt
+    return not content_type or content_type.split(";")[0].strip().lower() in HTML_CONTENT_TYPES
+
+def decode_html(body, charset=None):
+    # Header charset first, then a <meta> declaration near the top of the document, then UTF-8
+    if charset is None:
+        match = META_CHARSET_PATTERN.search(body, 0, 4096)
+        charset = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return body.decode(charset, errors="replace")
+
+# Each backend yields the text of every <p> element in document order
+def selectolax_paragraphs(html):
+    for node in HTMLParser(html).css("p"):
+        yield node.text(deep=True, separator="")
+
+def lxml_paragraphs(html):
+    # lxml refuses str input that starts with an encoding declaration (XHTML prologs), and the text is
+    # already decoded by then, so the declaration is dropped
+    try:
+        root = lxml.html.fromstring(XML_DECLARATION_PATTERN.sub("", html, count=1))
+    except Exception:
+        # Empty documents land here
+        return
+    for paragraph in root.iter("p"):
+        yield paragraph.text_content()
+
+def html_parser_paragraphs(html):
+    for paragraph in BeautifulSoup(html, "html.parser").find_all("p"):
+        yield paragraph.get_text()
+
+BACKENDS = {
+    "selectolax": selectolax_paragraphs if HTMLParser is not None else None,
+    "lxml": lxml_paragraphs if lxml is not None else None,
+    "html.parser": html_parser_paragraphs,
+}
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if backend is not None]
+
+def default_backend():
+    return available_backends()[0]
+
+def clean_paragraphs(paragraphs):
+    # Same rules as the old NewsFetcher.clean_text (lowercase, drop short lines, cut at "related articles"),
+    # but applied while walking the paragraphs so nothing past the related-articles block is collected
+    collected = []
+    for paragraph in paragraphs:
+        collected.append(paragraph)
+        if RELATED_PATTERN.search(paragraph):
+            break
+    text = " ".join(collected).strip().lower()
+    cleaned_text = '\n'.join(line for line in text.split('\n') if len(line) >= MIN_LINE_LENGTH)
+    match = RELATED_PATTERN.search(cleaned_text)
+    if match:
+        cleaned_text = cleaned_text[:match.start()].strip()
+    return cleaned_text
+
+def extract_article(html, backend=None, charset=None):
+    # Module-level so it can be shipped to a process pool; raw bytes are decoded there too
+    if isinstance(html, bytes):
+        html = decode_html(html, charset)
+    paragraphs = BACKENDS[backend or default_backend()]
+    return clean_paragraphs(paragraphs(html))
@@ -0,0 +1,147 @@
+import os
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.getenv("NEWS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# Query parameters that only identify the referrer, so two links to the same story share a cache entry
+TRACKING_PARAMS = {"fbclid", "gclid", "ocid", "cmpid", "mc_cid", "mc_eid", "ref", "smid", "cvid", "ei"}
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+def connect(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+class ArticleCache:
+    def __init__(self, path=None, ttl=6 * 60 * 60, max_bytes=256 * 1024 * 1024):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "articles.sqlite")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_accessed_at ON articles (accessed_at)")
+        self._conn.commit()
+
+    def get(self, url):
+        # Returns the cached entry with a 'fresh' flag; stale entries still carry validators for revalidation
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, etag, last_modified, fetched_at FROM articles WHERE url = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE articles SET accessed_at = ? WHERE url = ?", (now, key))
+            self._conn.commit()
+        text, etag, last_modified, fetched_at = row
+        return {
+            "text": text,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": now - fetched_at < self.ttl,
+        }
+
+    def put(self, url, text, etag=None, last_modified=None):
+        key = normalize_url(url)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, text, etag, last_modified, now, now, len(key) + len(text.encode("utf-8"))),
+            )
+            self._conn.commit()
+            self._evict()
+
+    def touch(self, url):
+        # A 304 Not Modified restarts the freshness window without rewriting the text
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, normalize_url(url))
+            )
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for url, size in self._conn.execute("SELECT url, size FROM articles ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM articles WHERE url = ?", (url,))
+            total -= size
+            evicted += 1
+        self._conn.commit()
+        logger.info(f"Evicted {evicted} articles from the article cache")
+
+class SearchCache:
+    # Search API responses keyed by the endpoint and the full query parameter set
+    def __init__(self, path=None, ttl=15 * 60):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "search.sqlite")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(url, params):
+        payload = json.dumps({"url": url, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, url, params):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND fetched_at > ?",
+                (self.make_key(url, params), time.time() - self.ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, url, params, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (self.make_key(url, params), json.dumps(response), now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE fetched_at <= ?", (now - self.ttl,))
+            self._conn.commit()
@@ -0,0 +1,174 @@
+from openai import OpenAI
+import json
+import logging
+import os
+import time
+from llmcache import LLMCache, replay_stream
+from llmgateway import get_gateway, INTERACTIVE
+from tokenbudget import count_tokens_uncached
+
+logger = logging.getLogger(__name__)
+
+# Tokens reserved for the completion when admitting a call; reconciled with the reported usage afterwards
+COMPLETION_TOKENS_ESTIMATE = 1024
+# Streamed deltas are handed on at most every STREAM_INTERVAL seconds or STREAM_CHARS characters, since
+# st.write_stream re-renders the whole Markdown block for every piece it receives
+STREAM_INTERVAL = 0.05
+STREAM_CHARS = 200
+
+_client = None
+
+def get_client():
+    # Created on first use so importing this module doesn't require OPENAI_API_KEY
+    global _client
+    if _client is None:
+        # Retries are handled by the gateway: a 429 pauses every caller rather than just this one, while
+        # connection errors, timeouts and 5xx responses are retried by the failing call alone
+        _client = OpenAI(max_retries=0)
+    return _client
+
+def get_openai_gateway():
+    return get_gateway(
+        "openai",
+        requests_per_minute=int(os.getenv("OPENAI_RPM", "500")),
+        tokens_per_minute=int(os.getenv("OPENAI_TPM", "450000")),
+    )
+
+def estimate_tokens(messages, model):
+    # Prompts are rarely repeated exactly and can hold a whole corpus, so they aren't kept in the token cache
+    return sum(count_tokens_uncached(message["content"], model) for message in messages) + COMPLETION_TOKENS_ESTIMATE
+
+response_cache = LLMCache()
+
+def get_response(messages, model='gpt-4o', use_cache=True, stage=None, metrics=None, priority=INTERACTIVE):
+    params = {"temperature": 1, "response_format": { "type": "json_object" }}
+    key = response_cache.make_key(model, params, messages)
+    start = time.perf_counter()
+    content = response_cache.get(key) if use_cache else None
+    if content is not None:
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError:
+            # Written before answers were checked; asking again replaces it
+            logger.warning(f"Ignoring a cached response for {stage or model} that isn't valid JSON")
+        else:
+            if metrics is not None:
+                metrics.record_llm_call(stage, model, None, time.perf_counter() - start, cache_hit=True)
+            return result
+    gateway = get_openai_gateway()
+    estimate = estimate_tokens(messages, model)
+    retries = []
+    response = gateway.call(
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            **params
+        ),
+        estimate,
+        priority,
+        on_retry=lambda attempt, delay: retries.append(delay),
+    )
+    gateway.reconcile(estimate, response.usage.total_tokens if response.usage else None)
+    content = response.choices[0].message.content
+    finish_reason = response.choices[0].finish_reason
+    if metrics is not None:
+        metrics.record_llm_call(stage, model, response.usage, time.perf_counter() - start, retries=len(retries), finish_reason=finish_reason)
+    result = json.loads(content)
+    # Only answers that parsed and weren't cut off are cached, so a bad one isn't replayed on every rerun
+    if finish_reason != "length":
+        response_cache.put(key, content)
+    return result
+
+class ResponseStream:
+    # Iterates a streamed completion as coalesced text pieces. Once it has been read to the end, text holds
+    # the full answer and finish_reason and usage what the API reported (both None for cached answers).
+    def __init__(self, deltas, interval=STREAM_INTERVAL, max_chars=STREAM_CHARS):
+        self.deltas = deltas
+        self.interval = interval
+        self.max_chars = max_chars
+        self.text = None
+        self.finish_reason = None
+        self.usage = None
+
+    def __iter__(self):
+        parts = []
+        buffer = []
+        buffered = 0
+        flushed = time.perf_counter()
+        deltas = iter(self.deltas)
+        while True:
+            try:
+                delta = next(deltas)
+            except StopIteration as stop:
+                # The delta generator returns (finish_reason, usage) when the stream ends
+                self.finish_reason, self.usage = stop.value or (None, None)
+                break
+            parts.append(delta)
+            buffer.append(delta)
+            buffered += len(delta)
+            # Checked as each delta arrives, so a stalled stream holds back at most one window of text
+            now = time.perf_counter()
+            if now - flushed >= self.interval or buffered >= self.max_chars:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+                flushed = now
+        if buffer:
+            yield "".join(buffer)
+        self.text = "".join(parts)
+
+def get_response_stream(messages, model='gpt-4o', use_cache=True, stage=None, metrics=None, priority=INTERACTIVE):
+    return ResponseStream(stream_deltas(messages, model, use_cache, stage, metrics, priority))
+
+def stream_deltas(messages, model='gpt-4o', use_cache=True, stage=None, metrics=None, priority=INTERACTIVE):
+    params = {"temperature": 1}
+    key = response_cache.make_key(model, params, messages)
+    start = time.perf_counter()
+    cached = response_cache.get(key) if use_cache else None
+    if cached is not None:
+        if metrics is not None:
+            metrics.record_llm_call(stage, model, None, time.perf_counter() - start, cache_hit=True)
+        yield from replay_stream(cached)
+        return None, None
+    parts = []
+    usage = None
+    finish_reason = None
+    ttft = None
+    retries = []
+    gateway = get_openai_gateway()
+    estimate = estimate_tokens(messages, model)
+    stream = gateway.call(
+        lambda: get_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **params
+        ),
+        estimate,
+        priority,
+        on_retry=lambda attempt, delay: retries.append(delay),
+    )
+    for chunk in stream:
+        # With include_usage the final chunk carries the usage block and no choices
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        if chunk.choices[0].finish_reason is not None:
+            finish_reason = chunk.choices[0].finish_reason
+        if chunk.choices[0].delta.content is not None:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    # Only reached when the stream was read to the end, so interrupted answers are never cached; truncated
+    # ones aren't either, so a rerun asks again instead of replaying the cut-off answer
+    if finish_reason == "length":
+        logger.warning(f"Response for {stage or model} was cut off at the completion token limit")
+    else:
+        response_cache.put(key, "".join(parts))
+    gateway.reconcile(estimate, usage.total_tokens if usage else None)
+    if metrics is not None:
+        metrics.record_llm_call(stage, model, usage, time.perf_counter() - start, ttft=ttft, retries=len(retries), finish_reason=finish_reason)
+    return finish_reason, usage
@@ -0,0 +1,90 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import time
+import logging
+from httpcache import DEFAULT_CACHE_DIR, connect
+
+logger = logging.getLogger(__name__)
+
+# Prompts embed datetime.now() as "Todays date is YYYY-MM-DD"; the TTL bounds how stale a reused answer can get
+DATE_PATTERN = re.compile(r"(Todays date is )\d{4}-\d{2}-\d{2}")
+
+def normalize_messages(messages):
+    return [
+        {"role": message["role"], "content": DATE_PATTERN.sub(r"\1<date>", message["content"]).strip()}
+        for message in messages
+    ]
+
+class LLMCache:
+    def __init__(self, path=None, ttl=24 * 60 * 60, max_bytes=64 * 1024 * 1024, enabled=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "llm.sqlite")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # LLM_CACHE=0 turns the cache off process-wide; callers can also bypass it per call
+        self.enabled = enabled if enabled is not None else os.getenv("LLM_CACHE", "1") != "0"
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model, params, messages):
+        payload = json.dumps(
+            {"model": model, "params": params, "messages": normalize_messages(messages)},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0]
+
+    def put(self, key, response):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, response, now, now, len(response.encode("utf-8"))),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+        logger.info("Evicted least recently used LLM responses from the cache")
+
+def replay_stream(text, chunk_size=24):
+    # Cached answers are re-yielded in small pieces so st.write_stream renders them the same way
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
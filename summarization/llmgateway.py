@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Lower values are served first: interactive streams shouldn't queue behind bulk extraction
+INTERACTIVE = 0
+BULK = 1
+
+class RateLimited(Exception):
+    # Raised when a call is still rate limited after the gateway's retries are exhausted
+    pass
+
+class TokenBucket:
+    # Refills continuously at capacity per minute. A take larger than the capacity is clamped to it,
+    # so an oversized request waits for a full bucket instead of forever.
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        # Corrects an earlier estimate once the real usage is known; the level may go negative,
+        # which simply delays the next callers until the overdraft has refilled
+        self.level = min(self.capacity, self.level - amount)
+
+def is_rate_limit_error(error):
+    # openai.RateLimitError, google.api_core's ResourceExhausted/TooManyRequests and plain HTTP errors all surface a 429
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    if getattr(getattr(error, "response", None), "status_code", None) == 429:
+        # requests.HTTPError keeps the status on its response
+        return True
+    return type(error).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+# Failures worth another try that say nothing about the quota: dropped connections, timeouts and server errors
+TRANSIENT_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = ("APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceUnavailable", "DeadlineExceeded", "ConnectionError", "Timeout")
+
+def is_transient_error(error):
+    # The OpenAI SDK's connection, timeout and 5xx errors, google.api_core's equivalents and plain HTTP errors
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+def retry_after(error):
+    # Seconds the server asked us to wait, when it said so
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+class LLMGateway:
+    # Admits calls against per-minute request and token budgets, in priority order. Callers block in
+    # acquire() until the head of the queue is theirs and both buckets can cover the request, so a shared
+    # quota is spent at a steady rate instead of in bursts. A 429 pauses every caller, not just the one that hit it;
+    # connection errors, timeouts and 5xx responses are retried by the failing caller alone.
+    def __init__(self, requests_per_minute, tokens_per_minute, max_retries=5, backoff=2.0, max_backoff=60.0, max_transient_retries=2, transient_backoff=0.5):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # The SDK's own retries are off so 429s are handled here; these stand in for its other retries
+        self.max_transient_retries = max_transient_retries
+        self.transient_backoff = transient_backoff
+        self.paused_until = 0.0
+        self.retries = 0
+        self._queue = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens, priority=BULK):
+        ticket = (priority, next(self._order))
+        with self._condition:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] == ticket:
+                        wait = max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if wait <= 0:
+                            self.requests.take(1)
+                            self.tokens.take(tokens)
+                            return
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+
+    def reconcile(self, estimated_tokens, actual_tokens):
+        if actual_tokens is None:
+            return
+        with self._condition:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds):
+        with self._condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def call(self, fn, tokens, priority=BULK, on_retry=None):
+        # Runs fn once admitted, retrying it on rate-limit errors and, a few times, on transient ones (connection
+        # errors, timeouts, 5xx). tokens is the caller's estimate of the request's total (prompt plus expected
+        # completion) tokens; pass the real figure to reconcile() afterwards. on_retry(attempt, delay) is called
+        # before each retry, e.g. to count retries per call.
+        rate_limited_attempts = 0
+        transient_attempts = 0
+        while True:
+            self.acquire(tokens, priority)
+            try:
+                return fn()
+            except Exception as error:
+                rate_limited = is_rate_limit_error(error)
+                if rate_limited:
+                    if rate_limited_attempts == self.max_retries:
+                        raise RateLimited(f"Still rate limited after {self.max_retries} retries") from error
+                    delay = retry_after(error)
+                    if delay is None:
+                        delay = min(self.max_backoff, self.backoff * 2 ** rate_limited_attempts) * random.uniform(0.5, 1.0)
+                    rate_limited_attempts += 1
+                elif is_transient_error(error):
+                    if transient_attempts == self.max_transient_retries:
+                        raise
+                    delay = retry_after(error)
+                    if delay is None:
+                        delay = min(self.max_backoff, self.transient_backoff * 2 ** transient_attempts) * random.uniform(0.5, 1.0)
+                    transient_attempts += 1
+                else:
+                    raise
+                with self._condition:
+                    self.retries += 1
+                if on_retry is not None:
+                    on_retry(rate_limited_attempts + transient_attempts, delay)
+                if rate_limited:
+                    self.pause(delay)
+                else:
+                    # One caller's failed request says nothing about the quota, so only that caller waits
+                    time.sleep(delay)
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+def get_gateway(name, requests_per_minute, tokens_per_minute, **kwargs):
+    # One gateway per provider quota, shared by every caller in the process
+    with _gateways_lock:
+        if name not in _gateways:
+            _gateways[name] = LLMGateway(requests_per_minute, tokens_per_minute, **kwargs)
+        return _gateways[name]
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# Counters exported per stage: (metric name, event kind, event field, help text)
+PROMETHEUS_COUNTERS = [
+    ("pipeline_llm_input_tokens_total", "llm", "input_tokens", "Prompt tokens sent to the model."),
+    ("pipeline_llm_cached_input_tokens_total", "llm", "cached_input_tokens", "Prompt tokens served from the provider's prompt cache."),
+    ("pipeline_llm_output_tokens_total", "llm", "output_tokens", "Completion tokens received from the model."),
+    ("pipeline_llm_retries_total", "llm", "retries", "Rate-limited attempts retried by the gateway."),
+    ("pipeline_fetch_bytes_total", "parse", "bytes", "Article bytes handed to the HTML extractor."),
+]
+
+class Metrics:
+    # Collects per-stage measurements for one pipeline run; safe to share between stage threads
+    # and the article fetch loop. Every event is a flat dict with a 'kind', a 'stage' and its fields.
+    def __init__(self):
+        self.events = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, kind, stage, **fields):
+        with self._lock:
+            self.events.append({"kind": kind, "stage": stage, "at": round(time.time() - self.started, 4), **fields})
+
+    @contextmanager
+    def span(self, kind, stage, **fields):
+        # Times the block; the event is recorded with ok=False if it raises
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield fields
+            ok = True
+        finally:
+            self.record(kind, stage, seconds=time.perf_counter() - start, ok=ok, **fields)
+
+    def record_llm_call(self, stage, model, usage, seconds, cache_hit=False, ttft=None, retries=0, finish_reason=None):
+        # usage is the response's usage block; cached_tokens is the part of the prompt the provider served
+        # from its prompt cache. Calls answered from our own response cache have no usage block at all.
+        details = getattr(usage, "prompt_tokens_details", None) if usage is not None else None
+        output_tokens = getattr(usage, "completion_tokens", 0) or 0
+        # Generation speed excludes the wait for the first token when the call was streamed
+        generating = seconds - ttft if ttft is not None else seconds
+        self.record(
+            "llm",
+            stage,
+            model=model,
+            seconds=seconds,
+            ttft=ttft,
+            cache_hit=cache_hit,
+            retries=retries,
+            finish_reason=finish_reason,
+            input_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            cached_input_tokens=(getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+            output_tokens=output_tokens,
+            tokens_per_second=output_tokens / generating if output_tokens and generating > 0 else None,
+        )
+
+    def frame(self, kind=None):
+        with self._lock:
+            events = [event for event in self.events if kind is None or event["kind"] == kind]
+        return pd.DataFrame(events)
+
+    def prompt_cache_summary(self):
+        llm_calls = self.frame("llm")
+        if llm_calls.empty:
+            return {"input_tokens": 0, "cached_input_tokens": 0, "cached_share": 0.0}
+        input_tokens = int(llm_calls["input_tokens"].sum())
+        cached_input_tokens = int(llm_calls["cached_input_tokens"].sum())
+        return {
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "cached_share": cached_input_tokens / input_tokens if input_tokens else 0.0,
+        }
+
+    def latency_summary(self):
+        # Count, total, p50 and p95 seconds per kind and stage, slowest total first
+        events = self.frame()
+        if events.empty or "seconds" not in events:
+            return pd.DataFrame(columns=["kind", "stage", "count", "total", "p50", "p95"])
+        timed = events.dropna(subset=["seconds"])
+        summary = timed.groupby(["kind", "stage"])["seconds"].agg(
+            count="count", total="sum", p50="median", p95=lambda seconds: seconds.quantile(0.95)
+        )
+        return summary.reset_index().sort_values("total", ascending=False, ignore_index=True)
+
+    def to_jsonl(self):
+        with self._lock:
+            events = list(self.events)
+        return "".join(json.dumps(event, default=str) + "\n" for event in events)
+
+    def to_prometheus(self):
+        # Text exposition format, suitable for node_exporter's textfile collector or a scrape endpoint
+        lines = [
+            "# HELP pipeline_stage_seconds Wall-clock seconds per pipeline stage.",
+            "# TYPE pipeline_stage_seconds summary",
+        ]
+        for row in self.latency_summary().itertuples():
+            labels = f'kind="{row.kind}",stage="{_label(row.stage)}"'
+            lines.append(f'pipeline_stage_seconds{{{labels},quantile="0.5"}} {row.p50:.6f}')
+            lines.append(f'pipeline_stage_seconds{{{labels},quantile="0.95"}} {row.p95:.6f}')
+            lines.append(f"pipeline_stage_seconds_sum{{{labels}}} {row.total:.6f}")
+            lines.append(f"pipeline_stage_seconds_count{{{labels}}} {row.count}")
+        events = self.frame()
+        for name, kind, field, help_text in PROMETHEUS_COUNTERS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            if events.empty or field not in events:
+                continue
+            totals = events[events["kind"] == kind].groupby("stage")[field].sum()
+            for stage, total in totals.items():
+                lines.append(f'{name}{{stage="{_label(stage)}"}} {total:g}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, jsonl_path=None, prometheus_path=None):
+        if jsonl_path:
+            with open(jsonl_path, "a", encoding="utf-8") as f:
+                f.write(self.to_jsonl())
+        if prometheus_path:
+            # Written to a temporary file and renamed so a scraper never reads a half-written file
+            with open(f"{prometheus_path}.tmp", "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(f"{prometheus_path}.tmp", prometheus_path)
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
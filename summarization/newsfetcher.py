@@ -1,13 +1,24 @@
 from dotenv import load_dotenv
-import json
-import requests
+import asyncio
+import aiohttp
+import math
 import pandas as pd
-import re
 import os
+import re
+import sys
 from IPython.display import Markdown, display
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import extractors
+from dedup import collapse_near_duplicates
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 import logging
+import queue
+import threading
+import time
 
 load_dotenv()
 
@@ -15,8 +26,60 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ARTICLE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
+}
+
+SEARCH_TIMEOUT = 30
+PARAGRAPH_END_PATTERN = re.compile(rb"</p>", re.IGNORECASE)
+PARAGRAPH_END_LENGTH = len(b"</p>")
+# Extra downloads started alongside a sample so failed or empty ones don't leave it short
+SAMPLE_OVERPROVISION = 1.2
+
+def search_query(params):
+    # aiohttp only accepts str/int query values, unlike requests
+    return {key: str(value) if isinstance(value, bool) else value for key, value in params.items()}
+
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+def get_parse_pool(max_workers=None):
+    # Pools are shared across fetchers since worker start-up costs more than parsing a page;
+    # spawn avoids forking a process that already runs fetch and Streamlit threads
+    with _parse_pools_lock:
+        if max_workers not in _parse_pools:
+            _parse_pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pools[max_workers]
+
+def discard_parse_pool(max_workers, pool):
+    # A pool whose worker died is broken for good, so the next get_parse_pool starts a fresh one
+    with _parse_pools_lock:
+        if _parse_pools.get(max_workers) is pool:
+            del _parse_pools[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def running_in_streamlit():
+    # Streamlit's script runner makes the app script __main__, which spawned workers would re-run and die in
+    if "streamlit.runtime" not in sys.modules:
+        return False
+    return sys.modules["streamlit.runtime"].exists()
+
+def seeded_order(articles_df, seed):
+    # A seeded shuffle that doesn't depend on the order the rows came in (search rank, download completion),
+    # so a topic samples the same articles, and sends the same prompts, on every run
+    return articles_df.sort_values('url', kind='stable').sample(frac=1, random_state=seed)
+
+def run_coroutine(coro):
+    # asyncio.run refuses to nest inside a running loop (e.g. Jupyter), so hop to a worker thread there
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
 class NewsFetcher:
-    def __init__(self, ticker, num_articles, subscription_key=None):
+    def __init__(self, ticker, num_articles, subscription_key=None, max_connections=50, max_connections_per_host=4, timeout=10, article_cache=None, search_cache=None, extractor=None, parse_workers=None, max_bytes=2 * 1024 * 1024, max_paragraphs=200, metrics=None, freshness="Month"):
         load_dotenv()
         self.subscription_key = subscription_key or os.getenv("AZURE_SEARCH_KEY")
         self.ticker = ticker
@@ -29,7 +92,7 @@ class NewsFetcher:
                 "cc": "US",
                 # "category": "Business",
                 "count": 100,
-                "freshness": "Month",
+                "freshness": freshness,
                 "mkt": "en-US",
                 "offset": 0,
                 "originalImg": True,
@@ -45,7 +108,7 @@ class NewsFetcher:
                 "cc": "US",
                 # "category": "Business",
                 "count": num_articles,
-                "freshness": "Month",
+                "freshness": freshness,
                 "mkt": "en-US",
                 "offset": 0,
                 "originalImg": True,
@@ -55,86 +118,338 @@ class NewsFetcher:
                 "textDecorations": True,
                 "textFormat": "HTML"
             }
+        # Article downloads share one pooled session; these bound the total and per-publisher
+        # concurrency, and the timeout covers the whole request (connect, headers and body).
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        # Optional httpcache.ArticleCache holding cleaned texts across topics and restarts
+        self.article_cache = article_cache
+        # Optional httpcache.SearchCache so reruns of a topic within its TTL skip the search API
+        self.search_cache = search_cache
+        # HTML extraction backend from extractors.BACKENDS, run on a shared process pool (0 parses on a thread,
+        # which is also the default under Streamlit)
+        self.extractor = extractor or extractors.default_backend()
+        if extractors.BACKENDS.get(self.extractor) is None:
+            raise ValueError(f"Extractor {self.extractor!r} is not available, choose from {extractors.available_backends()}")
+        self.parse_workers = 0 if parse_workers is None and running_in_streamlit() else parse_workers
+        # Article bodies are streamed and cut off at max_bytes, or earlier once max_paragraphs have closed
+        self.max_bytes = max_bytes
+        self.max_paragraphs = max_paragraphs
+        # Optional metrics.Metrics receiving a timed event per search, article download and parse
+        self.metrics = metrics
         self.articles_df = pd.DataFrame()
 
-    def fetch_news_bing(self):
-        all_articles = []
-        for offset in range(0, self.num_articles, 100):
-            self.params['offset'] = offset
+    async def _fetch_search_page(self, session, offset):
+        # Each page gets its own parameter copy so pages can be requested concurrently
+        params = {**self.params, "offset": offset}
+        if self.search_cache is not None:
+            cached = self.search_cache.get(self.search_url, params)
+            if cached is not None:
+                return cached
+        # requests silently dropped a missing subscription key header, aiohttp rejects it
+        headers = {key: value for key, value in self.headers.items() if value is not None}
+        async with session.get(self.search_url, headers=headers, params=search_query(params)) as response:
+            response.raise_for_status()
+            search_results = await response.json()
+        if self.search_cache is not None:
+            self.search_cache.put(self.search_url, params, search_results["value"])
+        return search_results["value"]
+
+    async def afetch_news_bing(self):
+        start = time.perf_counter()
+        articles_df = await self._afetch_news_bing()
+        if self.metrics is not None:
+            self.metrics.record("search", "search", seconds=time.perf_counter() - start, results=len(articles_df))
+        return articles_df
+
+    async def _afetch_news_bing(self):
+        page_size = self.params['count']
+        pages = {}
+        last_offset = float("inf")
+        timeout = aiohttp.ClientTimeout(total=SEARCH_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            tasks = {asyncio.ensure_future(self._fetch_search_page(session, offset)): offset for offset in range(0, self.num_articles, 100)}
+            pending = set(tasks)
             try:
-                response = requests.get(self.search_url, headers=self.headers, params=self.params)
-                response.raise_for_status()
-                search_results = response.json()
-                all_articles.extend(search_results["value"])
-                if len(search_results["value"]) < 100:
-                    break  # Break the loop if fewer than 100 articles are returned
-            except requests.exceptions.HTTPError as http_err:
-                if response.status_code == 401:
-                    logger.error("401 Unauthorized error. Check your subscription key.")
-                    return pd.DataFrame()
-                logger.error(f"HTTP error occurred: {http_err}")
-            except Exception as err:
-                logger.error(f"Error occurred: {err}")
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        offset = tasks[task]
+                        if task.cancelled() or offset > last_offset:
+                            continue
+                        try:
+                            pages[offset] = task.result()
+                        except aiohttp.ClientResponseError as http_err:
+                            if http_err.status == 401:
+                                logger.error("401 Unauthorized error. Check your subscription key.")
+                                return pd.DataFrame()
+                            logger.error(f"HTTP error occurred: {http_err}")
+                            continue
+                        except Exception as err:
+                            logger.error(f"Error occurred: {err}")
+                            continue
+                        if len(pages[offset]) < page_size:
+                            # A short page marks the end of the results, so later pages are wasted requests
+                            last_offset = min(last_offset, offset)
+                            for other in pending:
+                                if tasks[other] > last_offset:
+                                    other.cancel()
+            finally:
+                for task in pending:
+                    task.cancel()
+        all_articles = [article for offset in sorted(pages) if offset <= last_offset for article in pages[offset]]
         return pd.DataFrame(all_articles)  # Combine all articles into a DataFrame
 
-    @staticmethod
-    def get_article_text(url):
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        }
+    def fetch_news_bing(self):
+        return run_coroutine(self.afetch_news_bing())
+
+    async def get_article_text(self, session, url):
+        start = time.perf_counter()
+        cached = self.article_cache.get(url) if self.article_cache is not None else None
+        if cached is not None and cached['fresh']:
+            self._record_fetch(url, start, "cached")
+            return cached['text']
+        host = urlsplit(url).hostname or ""
+        outcome = "error"
         try:
-            response = requests.get(url, headers=headers, timeout=5)  # Set the read timeout to 5 seconds
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            paragraphs = soup.find_all("p")
-            return " ".join([paragraph.get_text() for paragraph in paragraphs])
-        except requests.exceptions.Timeout:
+            # Take the per-host slot first so a busy publisher doesn't hold global slots while queued
+            async with self._host_limits[host], self._connection_limit:
+                text, outcome = await asyncio.wait_for(self._download_article(session, url, cached), self.timeout)
+                return text
+        except asyncio.TimeoutError:
+            outcome = "timeout"
             logger.error(f"Timeout occurred for URL {url}. Skipping.")
-        except requests.exceptions.HTTPError as http_err:
-            if response.status_code == 401:
+        except aiohttp.ClientResponseError as http_err:
+            if http_err.status == 401:
                 logger.error(f"401 Unauthorized error for URL {url}. Skipping.")
             else:
                 logger.error(f"HTTP error occurred: {http_err}")
         except Exception as err:
             logger.error(f"Error occurred: {err}")
-        return ""
-
-    @staticmethod
-    def clean_text(raw):
-        text = BeautifulSoup(raw, 'html.parser').get_text().strip().lower()
-        cleaned_lines = [line for line in text.split('\n') if len(line) >= 50]
-        cleaned_text = '\n'.join(cleaned_lines)
-        pattern = re.compile(r'(related articles.*)', re.IGNORECASE)
-        match = pattern.search(cleaned_text)
-        if match:
-            cleaned_text = cleaned_text[:match.start()].strip()
-        return cleaned_text
+        finally:
+            self._record_fetch(url, start, outcome)
+        # A stale copy beats nothing when revalidation fails
+        return cached['text'] if cached is not None else ""
+
+    def _record_fetch(self, url, start, outcome):
+        # Per-URL wall-clock time, including any wait for a connection slot
+        if self.metrics is not None:
+            self.metrics.record("fetch", "fetch", seconds=time.perf_counter() - start, url=url, host=urlsplit(url).hostname, outcome=outcome)
+
+    async def _download_article(self, session, url, cached=None):
+        # Returns the cleaned text and how it was obtained: 'not_modified', 'skipped' or 'downloaded'
+        headers = {}
+        if cached is not None:
+            if cached['etag']:
+                headers["If-None-Match"] = cached['etag']
+            if cached['last_modified']:
+                headers["If-Modified-Since"] = cached['last_modified']
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                self.article_cache.touch(url)
+                return cached['text'], "not_modified"
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            content_type = response.headers.get("Content-Type", "")
+            if not extractors.is_html(content_type):
+                # PDFs, video and images have no <p> text worth downloading; cache the miss too
+                logger.info(f"Skipping {content_type} content for URL {url}.")
+                text, outcome = "", "skipped"
+            else:
+                body = await self.read_body(response)
+                parse_start = time.perf_counter()
+                text, outcome = await self.parse_article(body, response.charset), "downloaded"
+                if self.metrics is not None:
+                    self.metrics.record("parse", "parse", seconds=time.perf_counter() - parse_start, url=url, bytes=len(body))
+        if self.article_cache is not None:
+            self.article_cache.put(url, text, etag, last_modified)
+        return text, outcome
+
+    async def read_body(self, response):
+        # Stops at max_bytes or right after the max_paragraphs-th closing </p>, whichever comes first
+        chunks = []
+        size = 0
+        closed_paragraphs = 0
+        tail = b""
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            # The last few bytes of the previous chunk are searched too, so a tag split across chunks still counts
+            window = tail + chunk
+            end = None
+            start = 0
+            while closed_paragraphs < self.max_paragraphs:
+                position = PARAGRAPH_END_PATTERN.search(window, start)
+                if position is None:
+                    break
+                closed_paragraphs += 1
+                start = position.end()
+                end = start - len(tail)
+            if closed_paragraphs >= self.max_paragraphs:
+                chunks.append(chunk[:end])
+                break
+            tail = window[-(PARAGRAPH_END_LENGTH - 1):]
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break
+        return b"".join(chunks)[:self.max_bytes]
+
+    async def parse_article(self, body, charset=None):
+        # Parsing is CPU-bound: a process pool keeps it from competing with the fetch loop for the GIL
+        if self.parse_workers == 0:
+            return await asyncio.to_thread(extractors.extract_article, body, self.extractor, charset)
+        loop = asyncio.get_running_loop()
+        pool = get_parse_pool(self.parse_workers)
+        try:
+            return await loop.run_in_executor(pool, extractors.extract_article, body, self.extractor, charset)
+        except BrokenProcessPool:
+            logger.error("Parse pool broke, starting a new one")
+            discard_parse_pool(self.parse_workers, pool)
+            return await loop.run_in_executor(get_parse_pool(self.parse_workers), extractors.extract_article, body, self.extractor, charset)
+
+    @asynccontextmanager
+    async def article_session(self):
+        self._connection_limit = asyncio.Semaphore(self.max_connections)
+        self._host_limits = defaultdict(lambda: asyncio.Semaphore(self.max_connections_per_host))
+        connector = aiohttp.TCPConnector(
+            limit=self.max_connections,
+            limit_per_host=self.max_connections_per_host,
+            ttl_dns_cache=300,
+        )
+        async with aiohttp.ClientSession(connector=connector, headers=ARTICLE_HEADERS) as session:
+            yield session
+
+    async def _fetch_article_texts(self, urls):
+        async with self.article_session() as session:
+            return await asyncio.gather(*(self.get_article_text(session, url) for url in urls))
 
     def fetch_article_texts(self, articles_df):
-        print(articles_df.columns)
-        with ThreadPoolExecutor(max_workers=100) as executor:
-            future_to_url = {executor.submit(self.get_article_text, url): url for url in articles_df['url']}
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    data = future.result()
-                except Exception as exc:
-                    logger.error(f"Error fetching text for {url}: {exc}")
-                    data = ""
-                articles_df.loc[articles_df['url'] == url, 'text'] = data
+        articles_df['text'] = run_coroutine(self._fetch_article_texts(articles_df['url'].tolist()))
 
-    def run(self):
+    async def _fetch_article(self, session, article):
+        return {**article, 'text': await self.get_article_text(session, article['url'])}
+
+    async def afetch_search_results(self):
         logger.info("Fetching news from Bing News API")
-        bing_articles_df = self.fetch_news_bing()
+        bing_articles_df = await self.afetch_news_bing()
         logger.info(f"Fetched {len(bing_articles_df)} articles from Bing News API")
+        if bing_articles_df.empty:
+            return bing_articles_df
+        return bing_articles_df.drop_duplicates(subset=['url']).reset_index(drop=True)
+
+    def fetch_search_results(self):
+        return run_coroutine(self.afetch_search_results())
+
+    async def aiter_articles(self, articles_df=None):
+        # Yields search results with their cleaned 'text' in completion order, not search order
+        if articles_df is None:
+            articles_df = await self.afetch_search_results()
+        async with self.article_session() as session:
+            tasks = [asyncio.ensure_future(self._fetch_article(session, article)) for article in articles_df.to_dict('records')]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def aiter_sample(self, sample_size, articles_df=None, seed=None, overprovision=SAMPLE_OVERPROVISION):
+        # Downloads full text for a seeded random sample of the search results rather than all of them, and
+        # yields only articles that have text. About sample_size * overprovision downloads run at once; each
+        # failed or empty one is replaced by the next candidate, and the rest are cancelled once the sample is full.
+        # Articles are yielded in candidate order rather than as they finish, so the first ones are the same on
+        # every run whatever the download timings.
+        if articles_df is None:
+            articles_df = await self.afetch_search_results()
+        if articles_df.empty:
+            return
+        candidates = iter(enumerate(seeded_order(articles_df, seed).to_dict('records')))
+        async with self.article_session() as session:
+            pending = {}
+            # Finished downloads by candidate position (None when empty), held until every earlier one is done
+            finished = {}
+            next_position = 0
+
+            def start_next():
+                candidate = next(candidates, None)
+                if candidate is not None:
+                    position, article = candidate
+                    pending[asyncio.ensure_future(self._fetch_article(session, article))] = position
+
+            for _ in range(math.ceil(sample_size * overprovision)):
+                start_next()
+            filled = 0
+            try:
+                while pending and filled < sample_size:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        article = task.result()
+                        finished[pending.pop(task)] = article if article['text'] != '' else None
+                        if article['text'] == '':
+                            start_next()
+                    while next_position in finished and filled < sample_size:
+                        article = finished.pop(next_position)
+                        next_position += 1
+                        if article is not None:
+                            filled += 1
+                            yield article
+            finally:
+                for task in pending:
+                    task.cancel()
+        logger.info(f"Downloaded {filled} of {len(articles_df)} search results for the sample")
+
+    def iter_articles(self, articles_df=None):
+        return self._iterate(lambda: self.aiter_articles(articles_df))
+
+    def iter_sample(self, sample_size, articles_df=None, seed=None, overprovision=SAMPLE_OVERPROVISION):
+        return self._iterate(lambda: self.aiter_sample(sample_size, articles_df, seed, overprovision))
+
+    def _iterate(self, make_articles):
+        # Runs the fetch loop on a background thread so downloads keep going while the caller
+        # works on the articles that have already arrived
+        results = queue.Queue()
+        stop = threading.Event()
+        done = object()
+
+        async def pump():
+            articles = make_articles()
+            try:
+                async for article in articles:
+                    if stop.is_set():
+                        break
+                    results.put(article)
+            finally:
+                await articles.aclose()
 
-        combined_df = bing_articles_df.drop_duplicates(subset=['url']).reset_index(drop=True)
-        
-        logger.info("Fetching full text for articles")
-        self.fetch_article_texts(combined_df)
-        
-        logger.info("Cleaning article texts")
-        combined_df['text'] = combined_df['text'].apply(self.clean_text)
-        
-        self.articles_df = combined_df
+        def worker():
+            try:
+                asyncio.run(pump())
+            except Exception as exc:
+                results.put(exc)
+            finally:
+                results.put(done)
+
+        threading.Thread(target=worker, daemon=True).start()
+        try:
+            while (item := results.get()) is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    def collect(self, articles, collapse_syndicated=True):
+        # Builds the frame in one step instead of writing each text back with a per-URL .loc scan
+        self.articles_df = pd.DataFrame.from_records(list(articles))
+        if collapse_syndicated and 'text' in self.articles_df:
+            # Wire stories reprinted across publishers keep one copy plus their 'alternate_urls'
+            articles_count = len(self.articles_df)
+            self.articles_df = collapse_near_duplicates(self.articles_df)
+            logger.info(f"Collapsed {articles_count - len(self.articles_df)} near-duplicate articles")
         logger.info(f"Fetched and processed a total of {len(self.articles_df)} articles")
+        return self.articles_df
+
+    def run(self):
+        logger.info("Fetching and cleaning full text for articles")
+        self.collect(self.iter_articles())
@@ -0,0 +1,171 @@
+import datetime
+import json
+import zlib
+import prompts
+from llm import get_response, get_response_stream
+from llmgateway import INTERACTIVE
+from articles import articles_to_string
+from promptlayout import layout_messages
+from relevance import BM25Index
+from dedup import collapse_near_duplicates
+from stages import StageGraph
+
+# Token budget for the article text in each multi-article prompt, shared fairly across the sampled articles
+ARTICLE_TOKEN_BUDGET = 60000
+# Passages (~120 words each) most relevant to the topic and hypothesis that the hypothesis-testing prompts see
+RELEVANT_PASSAGES = 40
+SAMPLE_SIZE = 25
+SINGLE_SUMMARIES = 3
+
+def topic_seed(topic):
+    # Stable sampling per topic keeps prompts identical across reruns, so cached LLM responses can be reused
+    return zlib.crc32(topic.encode("utf-8"))
+
+def today():
+    return datetime.datetime.now().strftime('%Y-%m-%d')
+
+class TopicPipeline:
+    # The summarization stages for one topic, independent of any UI. Streaming stages hand their
+    # llm.ResponseStream to render(stage, stream), which must read it to the end (the app writes it into a
+    # container); show(stage, result) is called as each stage finishes. Both default to doing nothing visible.
+    def __init__(self, topic, model='gpt-4o', use_cache=True, metrics=None, priority=INTERACTIVE, render=None, show=None):
+        self.topic = topic
+        self.model = model
+        self.use_cache = use_cache
+        self.metrics = metrics
+        self.priority = priority
+        self.render = render or (lambda stage, stream: "".join(stream))
+        self.show = show or (lambda stage, result: None)
+
+    def _stream(self, stage, messages):
+        stream = get_response_stream(messages, self.model, self.use_cache, stage=stage, metrics=self.metrics, priority=self.priority)
+        self.render(stage, stream)
+        return stream.text
+
+    def _respond(self, stage, messages):
+        return get_response(messages, self.model, self.use_cache, stage=stage, metrics=self.metrics, priority=self.priority)
+
+    def sample_corpus(self, articles_df):
+        # Every stage over the sample starts with this exact text, so later calls reuse the provider's cached prefix
+        return articles_to_string(articles_df, token_budget=ARTICLE_TOKEN_BUDGET)
+
+    def relevant_corpus(self, relevant_df):
+        return articles_to_string(relevant_df, include_id=False, include_name=True, include_url=False, include_text=True, token_budget=ARTICLE_TOKEN_BUDGET)
+
+    def sample_articles(self, articles_df):
+        # Sample distinct stories rather than several reprints of the same wire copy. Rows are put in URL order
+        # first, since they arrive in download order and the seeded sample must not depend on it.
+        articles_df = articles_df[articles_df['text'] != ''].sort_values('url', kind='stable').reset_index(drop=True)
+        articles_df = collapse_near_duplicates(articles_df)
+        return articles_df.sample(min(SAMPLE_SIZE, len(articles_df)), random_state=topic_seed(self.topic)).reset_index(drop=True)
+
+    def summarize_article(self, stage, article_df):
+        messages = layout_messages(articles_to_string(article_df), f"You provide clear and concise summaries of news articles. It is crucial that you escape all dollar signs with a backslash: \\$. Todays date is {today()}", "Please summarize the article above.")
+        return self._stream(stage, messages)
+
+    def summarize_cycle(self, articles_df):
+        messages = layout_messages(self.sample_corpus(articles_df), f"{prompts.cycle_system_prompt}\n\nTodays date is {today()}", "Ensure you reference source URLs in the summaries using inline Markdown with footnote references, such as [^1^].")
+        return self._stream("cycle_summary", messages)
+
+    def generate_questions(self, articles_df):
+        messages = layout_messages(self.sample_corpus(articles_df), f"Topic: {self.topic}\n\nTodays date is {today()}\n\n{prompts.questioning_system_prompt}", "Please provide up to 6 open-ended questions that can be used to encourage critical thinking about the news cycle.")
+        return self._respond("questions", messages)
+
+    def analyze_questions(self, articles_df, questions):
+        messages = layout_messages(self.sample_corpus(articles_df), f"Topic: {self.topic}\n\nTodays date is {today()}\n\n{prompts.analyzing_system_prompt}", f"Questions:\n{json.dumps(questions)}")
+        return self._stream("analysis", messages)
+
+    def generate_hypothesis(self, articles_df):
+        messages = layout_messages(
+            self.sample_corpus(articles_df),
+            f"You provide a hypothesis and associated likelihood for news cycle analysis for the topic '{self.topic}'. It is crucial that you escape all dollar signs with a backslash: \\$. Todays date is {today()}",
+            f"The hypothesis should be a clear, specific, and falsifiable statement that addresses a single, measurable outcome within a defined time frame. It is absolutely imperative that the hypothesis possesses a sufficient level of granularity as to be falsifiable. The likelihood should be a string representation of a either 1, 2, or 3 (where 1 indicates a probability (0%, 50%], 2:(50%, 85%] and 3:(85%:100%)) that reflects your confidence level, is supported by prior knowledge, and is testable with recent information. Namely, we will be testing via the articles above.\nPlease provide a hypothesis and an initial likelihood in the following JSON format: {{\"hypothesis\": \"Your hypothesis here.\", \"probability\": \"Likelihood level (1,2,3) here\", \"rationale\": \"Short rationale here.\"}}"
+        )
+        return self._respond("hypothesis", messages)
+
+    def build_relevance_index(self, articles_df):
+        return BM25Index(articles_df)
+
+    def select_relevant_articles(self, relevance_index, hypothesis):
+        # The topic is part of the query, so passages about the story itself rank above ones that only share
+        # the hypothesis's wording
+        return relevance_index.relevant_articles(f"{self.topic}\n{hypothesis['hypothesis']}", RELEVANT_PASSAGES)
+
+    def generate_hypothesis_questions(self, relevant_df, hypothesis):
+        messages = layout_messages(
+            self.relevant_corpus(relevant_df),
+            f"Topic: {self.topic}\n\n{prompts.questioning_hypothesis_system_prompt}. Todays date is {today()}",
+            f"Hypothesis:\n{json.dumps(hypothesis['hypothesis'])}\n\nPlease provide up to 6 open-ended questions that can be used to test the hypothesis."
+        )
+        return self._respond("hypothesis_questions", messages)
+
+    def analyze_hypothesis(self, relevant_df, hypothesis, hypothesis_questions):
+        messages = layout_messages(
+            self.relevant_corpus(relevant_df),
+            f"Topic: {self.topic}\n\n{prompts.analyzing_questions_system_prompt}. Todays date is {today()}",
+            f"Hypothesis:\n{json.dumps(hypothesis['hypothesis'])}\n\nQuestions:\n{json.dumps(hypothesis_questions)}"
+        )
+        return self._stream("hypothesis_analysis", messages)
+
+    def finalize_hypothesis(self, relevant_df, hypothesis, hypothesis_analysis):
+        messages = layout_messages(
+            self.relevant_corpus(relevant_df),
+            f"Topic: {self.topic}\n\n{prompts.hypothesis_final_system_prompt}. Todays date is {today()}",
+            f"Hypothesis:\n{json.dumps(hypothesis['hypothesis'])}\n\\Likelihood\n{json.dumps(hypothesis['probability'])}\n\\Analysis:\n{hypothesis_analysis}\nThe final probability should reflect your confidence level after considering the analysis; it should be supported by the information in the articles and the analysis. Please evaluate the hypothesis and provide a final probability and rationale in the following JSON format: {{\"likelihood\": \"Final likelihood level (1,2,3) here\", \"rationale\": \"Short rationale here.\", \"further_research\": \"Alternative sources for further research here.\"}}\n Format your response for readability, with no headers larger than H5 (#####)."
+        )
+        return self._respond("final_analysis", messages)
+
+    def stage_graph(self, load_articles, first_articles=None):
+        # load_articles() returns every fetched article for the topic. When first_articles is given (the app
+        # passes the first downloads to arrive) the single-article summaries start on those right away;
+        # otherwise they summarize the first articles of the sample.
+        graph, add = self._graph()
+        for i in range(SINGLE_SUMMARIES):
+            name = f"summary_{i + 1}"
+            if first_articles is not None:
+                if i < len(first_articles):
+                    add(name, lambda name=name, i=i: self.summarize_article(name, first_articles.iloc[i:i + 1]))
+            else:
+                add(name, lambda articles_df, name=name, i=i: self.summarize_article(name, articles_df.iloc[i:i + 1]) if i < len(articles_df) else None, depends_on=["articles_df"])
+        add("articles_df", lambda: self.sample_articles(load_articles()))
+        add("cycle_summary", self.summarize_cycle, depends_on=["articles_df"])
+        add("questions", self.generate_questions, depends_on=["articles_df"])
+        add("analysis", self.analyze_questions, depends_on=["articles_df", "questions"])
+        add("hypothesis", self.generate_hypothesis, depends_on=["articles_df"])
+        self._add_hypothesis_testing(add)
+        return graph
+
+    def update_graph(self, load_articles, hypothesis):
+        # Tests an existing hypothesis against only the articles published since it was last tested; its
+        # 'probability' is the previous run's likelihood, so the final analysis moves it by what is new
+        graph, add = self._graph()
+        add("articles_df", lambda: self.sample_articles(load_articles()))
+        add("hypothesis", lambda: hypothesis)
+        self._add_hypothesis_testing(add)
+        return graph
+
+    def _graph(self):
+        graph = StageGraph()
+
+        def add(name, fn, depends_on=()):
+            def stage(**kwargs):
+                result = fn(**kwargs)
+                self.show(name, result)
+                return result
+            graph.add(name, stage, depends_on)
+
+        return graph, add
+
+    def _add_hypothesis_testing(self, add):
+        add("relevance_index", self.build_relevance_index, depends_on=["articles_df"])
+        add("relevant_df", self.select_relevant_articles, depends_on=["relevance_index", "hypothesis"])
+        add("hypothesis_questions", self.generate_hypothesis_questions, depends_on=["relevant_df", "hypothesis"])
+        add("hypothesis_analysis", self.analyze_hypothesis, depends_on=["relevant_df", "hypothesis", "hypothesis_questions"])
+        add("final_analysis", self.finalize_hypothesis, depends_on=["relevant_df", "hypothesis", "hypothesis_analysis"])
+
+    def run(self, load_articles, first_articles=None, max_workers=None, initializer=None):
+        # Independent LLM calls run side by side, so a topic takes roughly as long as its longest dependency chain
+        return self.stage_graph(load_articles, first_articles).run(max_workers=max_workers, initializer=initializer, metrics=self.metrics)
+
+    def update(self, load_articles, hypothesis, max_workers=None, initializer=None):
+        return self.update_graph(load_articles, hypothesis).run(max_workers=max_workers, initializer=initializer, metrics=self.metrics)
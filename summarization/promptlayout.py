@@ -0,0 +1,10 @@
+CORPUS_PREAMBLE = "The news articles for this task are below. Your instructions and the request follow after them."
+
+def layout_messages(corpus, instructions, request):
+    # Provider-side prompt caching matches on the longest identical prefix, so the article corpus goes first
+    # and every stage built from the same corpus shares it; topic, date and stage instructions come after
+    return [
+        {"role": "system", "content": f"{CORPUS_PREAMBLE}\n\n{corpus}"},
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": request},
+    ]
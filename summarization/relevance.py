@@ -0,0 +1,78 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have he her his i if in into is it its of on or our she "
+    "that the their them they this to was we were what when where which who will with would you".split()
+)
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def split_passages(text, words_per_passage=120):
+    words = text.split()
+    return [" ".join(words[start:start + words_per_passage]) for start in range(0, len(words), words_per_passage)]
+
+class BM25Index:
+    # Okapi BM25 over fixed-size passages of each article's text. Term weights are precomputed into a
+    # sparse passage x term matrix, so a query is a single sparse matrix-vector product.
+    def __init__(self, articles_df, k1=1.5, b=0.75, words_per_passage=120):
+        self.articles_df = articles_df
+        self.passages = []
+        owners = []
+        for position, text in enumerate(articles_df['text'].fillna("").astype(str)):
+            for passage in split_passages(text, words_per_passage):
+                self.passages.append(passage)
+                owners.append(position)
+        self.owners = np.array(owners, dtype=np.int64)
+
+        self.vocabulary = {}
+        rows, columns = [], []
+        for row, passage in enumerate(self.passages):
+            for token in tokenize(passage):
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+        shape = (len(self.passages), len(self.vocabulary))
+        # Duplicate (row, column) pairs are summed into term frequencies
+        term_frequencies = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=shape)
+
+        lengths = np.asarray(term_frequencies.sum(axis=1)).ravel()
+        average_length = lengths.mean() if len(lengths) else 0.0
+        document_frequencies = np.bincount(term_frequencies.indices, minlength=shape[1])
+        idf = np.log1p((shape[0] - document_frequencies + 0.5) / (document_frequencies + 0.5))
+
+        tf = term_frequencies.data
+        row_lengths = np.repeat(lengths, np.diff(term_frequencies.indptr))
+        norm = k1 * (1 - b + b * row_lengths / average_length) if average_length else k1
+        weights = term_frequencies.copy()
+        weights.data = idf[term_frequencies.indices] * tf * (k1 + 1) / (tf + norm)
+        self.weights = weights
+
+    def scores(self, query):
+        columns = [self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary]
+        if not columns:
+            return np.zeros(len(self.passages))
+        query_vector = np.bincount(columns, minlength=len(self.vocabulary))
+        return self.weights @ query_vector
+
+    def top_passages(self, query, k=40):
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.array([], dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def relevant_articles(self, query, k=40):
+        # The articles owning the top-k passages, with 'text' reduced to those passages in reading order.
+        # Index labels are kept so article IDs stay consistent with the full sample.
+        top = np.sort(self.top_passages(query, k))
+        if len(top) == 0:
+            return self.articles_df
+        passages = pd.Series([self.passages[i] for i in top]).groupby(self.owners[top]).agg(" ... ".join)
+        relevant_df = self.articles_df.iloc[passages.index].copy()
+        relevant_df['text'] = passages.values
+        return relevant_df
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import pyarrow as pa
+from pyarrow import ipc
+from httpcache import DEFAULT_CACHE_DIR, connect
+
+logger = logging.getLogger(__name__)
+
+# Schema metadata key listing the columns stored as JSON text
+JSON_COLUMNS_KEY = b"json_columns"
+
+def _is_nested(value):
+    return isinstance(value, (list, dict))
+
+def _encode_json(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return json.dumps(value)
+
+def to_table(articles_df):
+    # Search results carry nested JSON (provider lists, image dicts, 'alternate_urls'); Arrow needs one type
+    # per column, so those columns are stored as JSON text and listed in the schema metadata
+    articles_df = articles_df.copy()
+    json_columns = [
+        column for column in articles_df.columns
+        if articles_df[column].dtype == object and articles_df[column].map(_is_nested).any()
+    ]
+    for column in json_columns:
+        articles_df[column] = articles_df[column].map(_encode_json)
+    try:
+        table = pa.Table.from_pandas(articles_df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columns mixing scalar types (e.g. bools and strings) fall back to JSON as well
+        mixed = [column for column in articles_df.columns if articles_df[column].dtype == object and column not in json_columns]
+        for column in mixed:
+            articles_df[column] = articles_df[column].map(_encode_json)
+        json_columns += mixed
+        table = pa.Table.from_pandas(articles_df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), JSON_COLUMNS_KEY: json.dumps(json_columns).encode()}
+    return table.replace_schema_metadata(metadata)
+
+def from_table(table):
+    json_columns = json.loads((table.schema.metadata or {}).get(JSON_COLUMNS_KEY, b"[]"))
+    articles_df = table.to_pandas()
+    for column in json_columns:
+        articles_df[column] = articles_df[column].map(lambda value: json.loads(value) if isinstance(value, str) else None)
+    return articles_df
+
+class SnapshotStore:
+    # Fetched article frames per topic, written as uncompressed Arrow IPC files so loads are memory-mapped
+    # rather than read and decoded. An SQLite index shared by every session and worker process tracks
+    # snapshot age and size; expired snapshots and, past max_bytes, the least recently used ones are deleted.
+    def __init__(self, directory=None, ttl=60 * 60, max_bytes=512 * 1024 * 1024):
+        self.directory = directory or os.path.join(DEFAULT_CACHE_DIR, "snapshots")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect(os.path.join(self.directory, "index.sqlite"))
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS snapshots (
+                key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                path TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(topic):
+        return hashlib.sha256(topic.strip().lower().encode("utf-8")).hexdigest()
+
+    def get(self, topic):
+        # Returns (articles_df, created_at) for a fresh snapshot, or None
+        key = self.make_key(topic)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, created_at FROM snapshots WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE snapshots SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        path, created_at = row
+        try:
+            with pa.memory_map(path) as source:
+                table = ipc.open_file(source).read_all()
+            return from_table(table), created_at
+        except (FileNotFoundError, pa.ArrowInvalid) as err:
+            # Another process evicted or replaced it between the lookup and the read
+            logger.warning(f"Snapshot for {topic!r} could not be read: {err}")
+            return None
+
+    def put(self, topic, articles_df):
+        key = self.make_key(topic)
+        now = time.time()
+        table = to_table(articles_df)
+        # A new file per snapshot, renamed into place, so readers never see a partial write
+        path = os.path.join(self.directory, f"{key}-{int(now * 1000)}.arrow")
+        with pa.OSFile(f"{path}.tmp", "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+        with self._lock:
+            previous = self._conn.execute("SELECT path FROM snapshots WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?, ?)",
+                (key, topic, path, now, now, os.path.getsize(path)),
+            )
+            self._conn.commit()
+            if previous is not None and previous[0] != path:
+                self._remove(previous[0])
+            self._evict(keep=key)
+        return now
+
+    def _remove(self, path):
+        # Readers that already mapped the file keep their view; the data goes once they let go of it
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep=None):
+        expired = self._conn.execute("SELECT key, path FROM snapshots WHERE created_at <= ?", (time.time() - self.ttl,)).fetchall()
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM snapshots WHERE created_at > ?", (time.time() - self.ttl,)).fetchone()[0]
+        evicted = list(expired)
+        if total > self.max_bytes:
+            for key, path, size in self._conn.execute(
+                "SELECT key, path, size FROM snapshots WHERE created_at > ? ORDER BY accessed_at", (time.time() - self.ttl,)
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                evicted.append((key, path))
+                total -= size
+        for key, path in evicted:
+            self._conn.execute("DELETE FROM snapshots WHERE key = ?", (key,))
+            self._remove(path)
+        self._conn.commit()
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} topic snapshots")
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class StageGraph:
+    # Runs named stages on a thread pool as soon as the stages they depend on have finished.
+    # A stage function is called with its dependencies' results as keyword arguments.
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, fn, depends_on=()):
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined")
+        self.stages[name] = (fn, tuple(depends_on))
+        return self
+
+    def _check(self):
+        for name, (_, depends_on) in self.stages.items():
+            for dependency in depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f"Stage {name!r} depends on unknown stage {dependency!r}")
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage {name!r} is part of a dependency cycle")
+            visiting.add(name)
+            for dependency in self.stages[name][1]:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self, max_workers=None, initializer=None, metrics=None):
+        # initializer runs once per worker thread, e.g. to attach the Streamlit script context;
+        # metrics, a metrics.Metrics, gets a 'stage' event per finished or failed stage
+        self._check()
+        results = {}
+        failed = {}
+        timings = {}
+        pending = dict(self.stages)
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.stages) or 1, initializer=initializer) as executor:
+            running = {}
+            while pending or running:
+                for name, (fn, depends_on) in list(pending.items()):
+                    if any(dependency in failed for dependency in depends_on):
+                        failed[name] = RuntimeError(f"Skipped because a dependency of {name!r} failed")
+                        del pending[name]
+                    elif all(dependency in results for dependency in depends_on):
+                        kwargs = {dependency: results[dependency] for dependency in depends_on}
+                        running[executor.submit(self._timed, fn, kwargs)] = name
+                        del pending[name]
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name], timings[name] = future.result()
+                    except Exception as exc:
+                        logger.error(f"Stage {name} failed: {exc}")
+                        failed[name] = exc
+                    if metrics is not None:
+                        metrics.record("stage", name, seconds=timings.get(name), ok=name in results)
+        self.timings = timings
+        if failed:
+            name, exc = next(iter(failed.items()))
+            raise RuntimeError(f"Stage {name!r} failed") from exc
+        return results
+
+    @staticmethod
+    def _timed(fn, kwargs):
+        start = time.perf_counter()
+        result = fn(**kwargs)
+        return result, time.perf_counter() - start
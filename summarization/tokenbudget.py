@@ -0,0 +1,62 @@
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough characters-per-token ratio for English text, used when tiktoken isn't installed
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+# For one-off texts such as whole prompts, which would only push the articles out of count_tokens' cache
+def count_tokens_uncached(text, model='gpt-4o'):
+    if tiktoken is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+# Articles are counted once per process no matter how many prompts they end up in
+@lru_cache(maxsize=8192)
+def count_tokens(text, model='gpt-4o'):
+    return count_tokens_uncached(text, model)
+
+@lru_cache(maxsize=1024)
+def truncate_tokens(text, max_tokens, model='gpt-4o'):
+    if tiktoken is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    encoding = get_encoding(model)
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+def allocate_budget(token_counts, budget):
+    # Water-filling: short articles keep everything, and whatever they leave is split evenly
+    # among the longer ones, so the longest articles are the first (and most) truncated
+    allocations = [0] * len(token_counts)
+    remaining = budget
+    order = sorted(range(len(token_counts)), key=lambda i: token_counts[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocations[i] = min(token_counts[i], share)
+        remaining -= allocations[i]
+    return allocations
+
+def fit_to_budget(texts, budget, model='gpt-4o'):
+    # Returns the fitted texts and a report of what was cut: (position, original tokens, kept tokens)
+    texts = list(texts)
+    token_counts = [count_tokens(text, model) for text in texts]
+    allocations = allocate_budget(token_counts, budget)
+    fitted = []
+    report = []
+    for i, (text, tokens, allowed) in enumerate(zip(texts, token_counts, allocations)):
+        if allowed < tokens:
+            fitted.append(truncate_tokens(text, allowed, model))
+            report.append((i, tokens, allowed))
+        else:
+            fitted.append(text)
+    return fitted, report
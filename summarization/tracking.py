@@ -0,0 +1,142 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import pandas as pd
+from httpcache import DEFAULT_CACHE_DIR, connect
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACKING_PATH = os.getenv("TRACKING_DB", os.path.join(DEFAULT_CACHE_DIR, "tracking.sqlite"))
+# Articles indexed late can carry a publish time a little before the high-water mark
+LATE_ARTICLE_GRACE = datetime.timedelta(days=1)
+# Seen URLs older than the widest search window can't come back, so they are dropped
+SEEN_URL_RETENTION = 35 * 24 * 60 * 60
+
+def published_times(articles_df):
+    if 'datePublished' not in articles_df:
+        return pd.Series(pd.NaT, index=articles_df.index, dtype="datetime64[ns, UTC]")
+    return pd.to_datetime(articles_df['datePublished'], utc=True, errors="coerce", format="ISO8601")
+
+class TopicTracker:
+    # What each topic has already been run on, so a refresh only processes articles published since:
+    # the newest datePublished seen (the high-water mark), the URLs seen, the hypothesis being tracked
+    # and one likelihood row per run that called the model.
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_TRACKING_PATH
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS topics (
+                key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                high_water TEXT,
+                hypothesis TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (key, url)
+            );
+            CREATE TABLE IF NOT EXISTS likelihoods (
+                key TEXT NOT NULL,
+                run_at REAL NOT NULL,
+                hypothesis TEXT NOT NULL,
+                likelihood INTEGER NOT NULL,
+                rationale TEXT,
+                new_articles INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS likelihoods_key ON likelihoods (key, run_at);"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(topic):
+        return hashlib.sha256(topic.strip().lower().encode("utf-8")).hexdigest()
+
+    def state(self, topic):
+        # The tracked hypothesis with its latest likelihood as the prior, and the high-water mark; None for new topics
+        with self._lock:
+            row = self._conn.execute("SELECT high_water, hypothesis FROM topics WHERE key = ?", (self.make_key(topic),)).fetchone()
+        if row is None:
+            return None
+        high_water, hypothesis = row
+        return {"high_water": pd.Timestamp(high_water) if high_water else None, "hypothesis": json.loads(hypothesis)}
+
+    def freshness(self, topic):
+        # The narrowest Bing freshness window that still reaches back to the high-water mark
+        state = self.state(topic)
+        if state is None or state["high_water"] is None:
+            return "Month"
+        age = pd.Timestamp.now(tz="UTC") - state["high_water"] + LATE_ARTICLE_GRACE
+        if age <= datetime.timedelta(days=1):
+            return "Day"
+        if age <= datetime.timedelta(days=7):
+            return "Week"
+        return "Month"
+
+    def new_articles(self, topic, articles_df):
+        # Search results not processed by an earlier run and published after the high-water mark
+        state = self.state(topic)
+        if state is None or articles_df.empty:
+            return articles_df
+        with self._lock:
+            seen = {url for (url,) in self._conn.execute("SELECT url FROM seen_urls WHERE key = ?", (self.make_key(topic),))}
+        fresh = ~articles_df['url'].isin(seen)
+        if state["high_water"] is not None:
+            # Results without a publish time are kept, the seen URLs still filter them
+            published = published_times(articles_df)
+            fresh &= published.isna() | (published >= state["high_water"] - LATE_ARTICLE_GRACE)
+        return articles_df[fresh].reset_index(drop=True)
+
+    def record_run(self, topic, articles_df, hypothesis, likelihood, rationale=None, replayed=False, replace_hypothesis=False):
+        # articles_df is every article the run considered; its URLs become seen and its newest publish time the new mark.
+        # The tracked hypothesis is only replaced when there is none yet or replace_hypothesis is set; a run of the
+        # tracked hypothesis itself moves its prior to the new likelihood. Runs that replayed cached answers add no
+        # likelihood row, since they would repeat the last point rather than measure anything new.
+        key = self.make_key(topic)
+        now = time.time()
+        latest = published_times(articles_df).max() if not articles_df.empty else pd.NaT
+        tracked = {"hypothesis": hypothesis['hypothesis'], "probability": str(likelihood), "rationale": rationale or hypothesis.get('rationale', '')}
+        with self._lock:
+            row = self._conn.execute("SELECT high_water, hypothesis FROM topics WHERE key = ?", (key,)).fetchone()
+            high_water = row[0] if row is not None else None
+            if not pd.isna(latest) and (high_water is None or latest > pd.Timestamp(high_water)):
+                high_water = latest.isoformat()
+            if row is not None and not replace_hypothesis and json.loads(row[1])['hypothesis'] != hypothesis['hypothesis']:
+                tracked = json.loads(row[1])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO topics VALUES (?, ?, ?, ?, ?)",
+                (key, topic, high_water, json.dumps(tracked), now),
+            )
+            if not articles_df.empty:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO seen_urls VALUES (?, ?, ?)",
+                    [(key, url, now) for url in articles_df['url']],
+                )
+            if not replayed:
+                self._conn.execute(
+                    "INSERT INTO likelihoods VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, now, hypothesis['hypothesis'], int(likelihood), rationale, len(articles_df)),
+                )
+            self._conn.execute("DELETE FROM seen_urls WHERE seen_at <= ?", (now - SEEN_URL_RETENTION,))
+            self._conn.commit()
+        logger.info(f"Recorded likelihood {likelihood} for {topic} from {len(articles_df)} articles" + (" (replayed, not charted)" if replayed else ""))
+
+    def history(self, topic, hypothesis=None):
+        # One row per run, oldest first; with a hypothesis, only the runs that tested it, so the rows form one series
+        query = "SELECT run_at, likelihood, new_articles, hypothesis, rationale FROM likelihoods WHERE key = ?"
+        params = [self.make_key(topic)]
+        if hypothesis is not None:
+            query += " AND hypothesis = ?"
+            params.append(hypothesis)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY run_at", params).fetchall()
+        history_df = pd.DataFrame(rows, columns=["run_at", "likelihood", "new_articles", "hypothesis", "rationale"])
+        history_df['run_at'] = pd.to_datetime(history_df['run_at'], unit="s", utc=True)
+        return history_df